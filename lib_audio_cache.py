@@ -0,0 +1,59 @@
+"""
+Audio cache for the text-to-speech utility.
+
+This file contains an on-disk cache of synthesized audio segments. Entries are keyed on a
+hash of the exact text sent to the TTS API and the voice settings (language, voice, rate,
+pitch, encoding), so segments that repeat across chapters and books, and the chunks of a
+chapter that did not change, are served locally instead of being synthesized again. The
+cache is bounded in size and evicts the least recently used entries first.
+"""
+import os
+import threading
+
+from lib_disk_cache import DiskCache
+
+# Where cached audio is stored and how large the cache may grow
+DEFAULT_CACHE_FOLDER = os.path.join(os.path.expanduser("~"), ".cache", "minibook_composer", "tts")
+DEFAULT_CACHE_MAX_BYTES = 500 * 1024 * 1024  # 500 MB
+
+
+class AudioCache(DiskCache):
+    """
+    A size-bounded LRU cache of audio segments stored as one file per entry.
+
+    Parameters:
+        cache_folder: Directory holding the cache entries
+        max_bytes: Total size above which the least recently used entries are evicted
+        enabled: If False, the cache is neither read nor written
+    """
+
+    extension = ".audio"
+
+    def __init__(self, cache_folder=DEFAULT_CACHE_FOLDER, max_bytes=DEFAULT_CACHE_MAX_BYTES, enabled=True):
+        super().__init__(cache_folder, max_bytes, enabled)
+
+    def serialize(self, data):
+        return data
+
+    def deserialize(self, data):
+        return data
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_audio_cache(cache_folder=None, max_bytes=None, enabled=True):
+    """
+    Return the process-wide audio cache, creating it on first use.
+    Arguments only take effect when the cache is created.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AudioCache(
+                cache_folder or DEFAULT_CACHE_FOLDER,
+                max_bytes or DEFAULT_CACHE_MAX_BYTES,
+                enabled
+            )
+        return _cache
@@ -0,0 +1,118 @@
+"""
+Disk cache shared by the LLM response cache and the TTS audio cache.
+
+This file contains a size-bounded, content-addressed cache that stores one file per entry
+and evicts the least recently used entries first. Subclasses choose the file extension and
+how values are turned into bytes and back.
+"""
+import os
+import threading
+import time
+
+
+class DiskCache:
+    """
+    A size-bounded LRU cache stored as one file per entry.
+
+    Subclasses set extension and implement serialize() and deserialize().
+
+    Parameters:
+        cache_folder: Directory holding the cache entries
+        max_bytes: Total size above which the least recently used entries are evicted
+        enabled: If False, the cache is neither read nor written
+        refresh: If True, cached entries are ignored but new values are still stored
+    """
+
+    extension = ".cache"
+
+    def __init__(self, cache_folder, max_bytes, enabled=True, refresh=False):
+        self.cache_folder = cache_folder
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.refresh = refresh
+        self.lock = threading.Lock()
+        self.entries = {}  # key -> (size in bytes, last used timestamp)
+        self.total_bytes = 0
+        if self.enabled:
+            self._load_index()
+
+    def serialize(self, value, **metadata):
+        """Return the bytes stored for a value."""
+        raise NotImplementedError
+
+    def deserialize(self, data):
+        """Return the value stored in an entry's bytes; raise ValueError or KeyError if it is broken."""
+        raise NotImplementedError
+
+    def _path(self, key):
+        return os.path.join(self.cache_folder, key[:2], f"{key}{self.extension}")
+
+    def _load_index(self):
+        """Build the in-memory index of entries from the files on disk."""
+        if not os.path.isdir(self.cache_folder):
+            return
+        for root, _, files in os.walk(self.cache_folder):
+            for file in files:
+                if not file.endswith(self.extension):
+                    continue
+                stat = os.stat(os.path.join(root, file))
+                self.entries[file[:-len(self.extension)]] = (stat.st_size, stat.st_mtime)
+                self.total_bytes += stat.st_size
+
+    def get(self, key):
+        """Return the cached value for a key, or None on a miss."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            if self.refresh or key not in self.entries:
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    value = self.deserialize(f.read())
+            except (OSError, ValueError, KeyError):
+                # Treat unreadable entries as misses and forget about them
+                self._remove(key)
+                return None
+            now = time.time()
+            os.utime(path, (now, now))
+            self.entries[key] = (self.entries[key][0], now)
+            return value
+
+    def put(self, key, value, **metadata):
+        """Store a value under a key and evict old entries if the cache is too large."""
+        if not self.enabled:
+            return
+        data = self.serialize(value, **metadata)
+        if not data:
+            return
+        with self.lock:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so readers never see a partial entry
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            if key in self.entries:
+                self.total_bytes -= self.entries[key][0]
+            self.entries[key] = (len(data), time.time())
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _remove(self, key):
+        size, _ = self.entries.pop(key, (0, 0))
+        self.total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, _ in sorted(self.entries.items(), key=lambda item: item[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self._remove(key)
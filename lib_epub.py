@@ -0,0 +1,543 @@
+"""
+Native EPUB writer for the markdown to EPUB converter.
+
+This file contains a small markdown to XHTML renderer and an EPUB3 packager that builds a book
+in memory, without running pandoc or writing temporary files. It covers the markdown produced
+by merge_chapters (a title, a table of contents, `## Chapter N:` sections, paragraphs, lists,
+block quotes, tables and code); anything else raises UnsupportedMarkdown so the caller can
+fall back to pandoc.
+"""
+import html
+import io
+import mimetypes
+import os
+import re
+import uuid
+import zipfile
+from datetime import datetime, timezone
+
+# Headings up to this level start a new XHTML file in the book
+SPLIT_LEVEL = 2
+
+# Headings up to this level are listed in the navigation document
+TOC_DEPTH = 3
+
+HEADING = re.compile(r'^\s{0,3}(#{1,6})\s+(.*?)(?:\s+#+)?\s*$')
+HEADING_ID = re.compile(r'\s*\{#([A-Za-z][\w.:-]*)\}$')
+FENCE = re.compile(r'^\s*(```+|~~~+)')
+HORIZONTAL_RULE = re.compile(r'^\s{0,3}([-*_])(?:\s*\1){2,}\s*$')
+SETEXT_UNDERLINE = re.compile(r'^\s{0,3}(?:=+|-+)\s*$')
+LIST_ITEM = re.compile(r'^(\s*)([-*+]|\d+[.)])(\s+)(.*)$')
+BLOCKQUOTE = re.compile(r'^\s{0,3}>\s?(.*)$')
+TABLE_SEPARATOR = re.compile(r'^\s*\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$')
+ANCHOR = re.compile(r"""^\s*<a\s+(?:name|id)=['"]([^'"]+)['"]\s*>\s*</a>\s*$""")
+INLINE = re.compile(r"""
+    \\(?P<escaped>[\\`*_{}\[\]()#+\-.!|~<>$])
+  | (?P<code_fence>`+)(?P<code>.+?)(?P=code_fence)
+  | \[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)(?:\s+"[^"]*")?\)
+  | \*\*(?=\S)(?P<strong>.+?)(?<=\S)\*\*
+  | (?<!\w)__(?=\S)(?P<strong_underscore>.+?)(?<=\S)__(?!\w)
+  | \*(?=[^\s*])(?P<emphasis>.+?)(?<=[^\s*])\*
+  | (?<!\w)_(?=\S)(?P<emphasis_underscore>.+?)(?<=\S)_(?!\w)
+""", re.VERBOSE)
+UNSUPPORTED_INLINE = re.compile(r'(?<!\\)(?:!\[|\[\^|\$\$|<[A-Za-z/!])')
+CODE_SPAN = re.compile(r'(`+).+?\1')
+TABLE_CELL_SPLIT = re.compile(r'(?<!\\)\|')
+LOCAL_LINK = re.compile(r'href="#([^"]+)"')
+
+
+class UnsupportedMarkdown(ValueError):
+    """Raised for markdown the native writer cannot render like pandoc would."""
+
+
+def _indentation(line):
+    return len(line) - len(line.lstrip(' '))
+
+
+def _plain_text(fragment):
+    """Return the text of an XHTML fragment without its tags."""
+    return html.unescape(re.sub(r'<[^>]+>', '', fragment))
+
+
+class MarkdownRenderer:
+    """
+    Renders markdown to XHTML fragments.
+
+    Heading identifiers are made unique across the whole document, the way pandoc does, and
+    every heading is returned with its level, text and identifier so the book can be split
+    into files and given a navigation document.
+    """
+
+    def __init__(self):
+        self.used_ids = set()
+
+    def unique_id(self, text):
+        """Turn heading text into a unique identifier (pandoc's auto_identifiers rules)."""
+        slug = re.sub(r'[^\w\s.-]', '', text.lower(), flags=re.UNICODE)
+        slug = re.sub(r'\s+', '-', slug.strip())
+        slug = re.sub(r'^[^a-z]+', '', slug) or 'section'
+        candidate, counter = slug, 0
+        while candidate in self.used_ids:
+            counter += 1
+            candidate = f"{slug}-{counter}"
+        self.used_ids.add(candidate)
+        return candidate
+
+    def inline(self, text):
+        """Render the inline markup of a paragraph, heading, list item or table cell."""
+        unsupported = UNSUPPORTED_INLINE.search(CODE_SPAN.sub('', text))
+        if unsupported:
+            raise UnsupportedMarkdown(f"unsupported inline markup {unsupported.group(0)!r}")
+        parts = []
+        position = 0
+        for match in INLINE.finditer(text):
+            parts.append(html.escape(text[position:match.start()], quote=False))
+            if match.group('escaped') is not None:
+                parts.append(html.escape(match.group('escaped'), quote=False))
+            elif match.group('code') is not None:
+                parts.append(f"<code>{html.escape(match.group('code').strip(), quote=False)}</code>")
+            elif match.group('link_text') is not None:
+                url = html.escape(match.group('link_url'), quote=True)
+                parts.append(f'<a href="{url}">{self.inline(match.group("link_text"))}</a>')
+            elif match.group('strong') is not None:
+                parts.append(f"<strong>{self.inline(match.group('strong'))}</strong>")
+            elif match.group('strong_underscore') is not None:
+                parts.append(f"<strong>{self.inline(match.group('strong_underscore'))}</strong>")
+            elif match.group('emphasis') is not None:
+                parts.append(f"<em>{self.inline(match.group('emphasis'))}</em>")
+            else:
+                parts.append(f"<em>{self.inline(match.group('emphasis_underscore'))}</em>")
+            position = match.end()
+        parts.append(html.escape(text[position:], quote=False))
+        return ''.join(parts)
+
+    def blocks(self, lines):
+        """
+        Render a list of lines as block elements.
+        Returns a list of (xhtml, heading) pairs where heading is (level, text, id) or None.
+        """
+        result = []
+        pending_id = None
+        i = 0
+        count = len(lines)
+        while i < count:
+            line = lines[i]
+            stripped = line.strip()
+            if not stripped:
+                i += 1
+                continue
+
+            anchor = ANCHOR.match(line)
+            if anchor:
+                # Anchors written by merge_chapters name the heading that follows them
+                if pending_id:
+                    result.append((f'<div id="{pending_id}"></div>', None))
+                pending_id = anchor.group(1)
+                self.used_ids.add(pending_id)
+                i += 1
+                continue
+
+            heading = HEADING.match(line)
+            if heading:
+                level = len(heading.group(1))
+                text = heading.group(2)
+                explicit_id = HEADING_ID.search(text)
+                if explicit_id:
+                    text = text[:explicit_id.start()]
+                content = self.inline(text)
+                if explicit_id:
+                    heading_id = explicit_id.group(1)
+                    self.used_ids.add(heading_id)
+                elif pending_id:
+                    heading_id = pending_id
+                else:
+                    heading_id = self.unique_id(_plain_text(content))
+                if pending_id and pending_id != heading_id:
+                    result.append((f'<div id="{pending_id}"></div>', None))
+                pending_id = None
+                result.append((f'<h{level} id="{heading_id}">{content}</h{level}>',
+                               (level, _plain_text(content), heading_id)))
+                i += 1
+                continue
+
+            if pending_id:
+                result.append((f'<div id="{pending_id}"></div>', None))
+                pending_id = None
+
+            if FENCE.match(line):
+                fence = FENCE.match(line).group(1)
+                end = i + 1
+                while end < count and not lines[end].strip().startswith(fence):
+                    end += 1
+                code = '\n'.join(lines[i + 1:end])
+                result.append((f"<pre><code>{html.escape(code, quote=False)}</code></pre>", None))
+                i = end + 1
+                continue
+
+            if HORIZONTAL_RULE.match(line):
+                result.append(('<hr />', None))
+                i += 1
+                continue
+
+            if BLOCKQUOTE.match(line):
+                quoted = []
+                while i < count and lines[i].strip():
+                    quote = BLOCKQUOTE.match(lines[i])
+                    quoted.append(quote.group(1) if quote else lines[i])
+                    i += 1
+                inner = ''.join(fragment for fragment, _ in self.blocks(quoted))
+                result.append((f"<blockquote>\n{inner}\n</blockquote>", None))
+                continue
+
+            if LIST_ITEM.match(line):
+                fragment, i = self._list(lines, i)
+                result.append((fragment, None))
+                continue
+
+            if '|' in line and i + 1 < count and TABLE_SEPARATOR.match(lines[i + 1]) and '-' in lines[i + 1]:
+                fragment, i = self._table(lines, i)
+                result.append((fragment, None))
+                continue
+
+            if stripped.startswith('<'):
+                raise UnsupportedMarkdown(f"raw HTML block {stripped[:40]!r}")
+            if _indentation(line) >= 4:
+                raise UnsupportedMarkdown("indented code block")
+
+            # A paragraph runs until a blank line or the start of another block
+            paragraph = [stripped]
+            i += 1
+            while i < count and lines[i].strip():
+                if SETEXT_UNDERLINE.match(lines[i]):
+                    raise UnsupportedMarkdown("setext heading")
+                if (HEADING.match(lines[i]) or FENCE.match(lines[i]) or BLOCKQUOTE.match(lines[i])
+                        or LIST_ITEM.match(lines[i]) or HORIZONTAL_RULE.match(lines[i])):
+                    break
+                paragraph.append(lines[i].strip())
+                i += 1
+            text = '\n'.join(paragraph)
+            result.append((f"<p>{self.inline(text)}</p>", None))
+
+        if pending_id:
+            result.append((f'<div id="{pending_id}"></div>', None))
+        return result
+
+    def _list(self, lines, i):
+        """Render the list starting at lines[i]. Returns the fragment and the next line index."""
+        first = LIST_ITEM.match(lines[i])
+        indent = len(first.group(1))
+        ordered = first.group(2)[0].isdigit()
+        items = []
+        loose = False
+        count = len(lines)
+        while i < count:
+            item = LIST_ITEM.match(lines[i])
+            if not item or len(item.group(1)) != indent or item.group(2)[0].isdigit() != ordered:
+                break
+            content_indent = len(item.group(1)) + len(item.group(2)) + len(item.group(3))
+            item_lines = [item.group(4)]
+            i += 1
+            while i < count:
+                line = lines[i]
+                if not line.strip():
+                    following = i + 1
+                    while following < count and not lines[following].strip():
+                        following += 1
+                    if following < count and _indentation(lines[following]) > indent:
+                        item_lines.append('')
+                        i += 1
+                        continue
+                    break
+                if _indentation(line) > indent:
+                    item_lines.append(line[min(_indentation(line), content_indent):])
+                elif LIST_ITEM.match(line) or not item_lines[-1].strip():
+                    break
+                else:
+                    # Lazy continuation of the item's paragraph
+                    item_lines.append(line.strip())
+                i += 1
+            items.append(item_lines)
+
+            # Blank lines between items of the same list make it a loose list
+            following = i
+            while following < count and not lines[following].strip():
+                following += 1
+            if following > i and following < count:
+                sibling = LIST_ITEM.match(lines[following])
+                if sibling and len(sibling.group(1)) == indent and sibling.group(2)[0].isdigit() == ordered:
+                    loose = True
+                    i = following
+                    continue
+            if following > i:
+                break
+
+        tag = 'ol' if ordered else 'ul'
+        start = ''
+        if ordered and int(first.group(2)[:-1]) != 1:
+            start = f' start="{int(first.group(2)[:-1])}"'
+        rendered = []
+        for item_lines in items:
+            blocks = [fragment for fragment, _ in self.blocks(item_lines)]
+            if not loose and blocks and blocks[0].startswith('<p>'):
+                # Tight lists hold their text directly, like pandoc's output
+                blocks[0] = blocks[0][3:-4]
+            rendered.append(f"<li>{''.join(blocks)}</li>")
+        return f"<{tag}{start}>\n" + '\n'.join(rendered) + f"\n</{tag}>", i
+
+    def _table(self, lines, i):
+        """Render the pipe table starting at lines[i]. Returns the fragment and the next line index."""
+        def cells(line):
+            line = line.strip()
+            if line.startswith('|'):
+                line = line[1:]
+            if line.endswith('|') and not line.endswith('\\|'):
+                line = line[:-1]
+            return [cell.strip() for cell in TABLE_CELL_SPLIT.split(line)]
+
+        header = cells(lines[i])
+        alignments = []
+        for separator in cells(lines[i + 1]):
+            if separator.startswith(':') and separator.endswith(':'):
+                alignments.append('center')
+            elif separator.endswith(':'):
+                alignments.append('right')
+            elif separator.startswith(':'):
+                alignments.append('left')
+            else:
+                alignments.append(None)
+
+        def row(values, cell_tag):
+            rendered = []
+            for index, value in enumerate(values):
+                align = alignments[index] if index < len(alignments) else None
+                style = f' style="text-align: {align};"' if align else ''
+                rendered.append(f"<{cell_tag}{style}>{self.inline(value)}</{cell_tag}>")
+            return f"<tr>{''.join(rendered)}</tr>"
+
+        body = []
+        i += 2
+        while i < len(lines) and lines[i].strip() and '|' in lines[i]:
+            body.append(row(cells(lines[i]), 'td'))
+            i += 1
+        fragment = (f"<table>\n<thead>\n{row(header, 'th')}\n</thead>\n"
+                    f"<tbody>\n" + '\n'.join(body) + "\n</tbody>\n</table>")
+        return fragment, i
+
+
+def split_into_sections(markdown_text):
+    """
+    Render a markdown book and split it into sections at headings up to SPLIT_LEVEL.
+    Returns a list of sections, each a dict with the XHTML body and the headings it contains.
+    """
+    renderer = MarkdownRenderer()
+    sections = []
+    current = None
+    for fragment, heading in renderer.blocks(markdown_text.splitlines()):
+        if current is None or (heading and heading[0] <= SPLIT_LEVEL and current['headings']):
+            current = {'body': [], 'headings': []}
+            sections.append(current)
+        current['body'].append(fragment)
+        if heading:
+            current['headings'].append(heading)
+    return sections
+
+
+def _xhtml_document(title, body, language, stylesheet='../styles/stylesheet.css', body_type=None):
+    epub_type = f' epub:type="{body_type}"' if body_type else ''
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<!DOCTYPE html>\n'
+        f'<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+        f'xml:lang="{language}" lang="{language}">\n'
+        '<head>\n'
+        '<meta charset="utf-8" />\n'
+        f'<title>{html.escape(title)}</title>\n'
+        f'<link rel="stylesheet" type="text/css" href="{stylesheet}" />\n'
+        '</head>\n'
+        f'<body{epub_type}>\n{body}\n</body>\n'
+        '</html>\n'
+    )
+
+
+def _nested_toc(entries):
+    """Nest (level, text, href) entries under the nearest previous entry of a lower level."""
+    root = []
+    stack = [(0, root)]
+    for level, text, href in entries:
+        while stack[-1][0] >= level:
+            stack.pop()
+        node = {'text': text, 'href': href, 'children': []}
+        stack[-1][1].append(node)
+        stack.append((level, node['children']))
+    return root
+
+
+def _nav_list(nodes):
+    items = []
+    for node in nodes:
+        children = f"\n{_nav_list(node['children'])}" if node['children'] else ''
+        items.append(f'<li><a href="{node["href"]}">{html.escape(node["text"])}</a>{children}</li>')
+    return "<ol>\n" + '\n'.join(items) + "\n</ol>"
+
+
+def _ncx_points(nodes, counter):
+    points = []
+    for node in nodes:
+        counter[0] += 1
+        number = counter[0]
+        children = _ncx_points(node['children'], counter)
+        points.append(
+            f'<navPoint id="navPoint-{number}" playOrder="{number}">'
+            f'<navLabel><text>{html.escape(node["text"])}</text></navLabel>'
+            f'<content src="{node["href"]}" />{children}</navPoint>'
+        )
+    return '\n'.join(points)
+
+
+def _depth(nodes):
+    return 1 + max((_depth(node['children']) for node in nodes), default=0) if nodes else 0
+
+
+def build_epub(markdown_text, output_path, title, css='', cover_image=None, language='en'):
+    """
+    Build an EPUB3 book from markdown entirely in memory and write it to output_path.
+
+    Args:
+        markdown_text (str): The (preprocessed) markdown of the book
+        output_path (str): Path of the EPUB file to write
+        title (str): Title of the book
+        css (str): Stylesheet for all pages
+        cover_image (str, optional): Path of a cover image
+        language (str): Language code of the book
+
+    Returns:
+        str: output_path
+
+    Raises:
+        UnsupportedMarkdown: If the markdown uses constructs the native writer does not handle
+    """
+    sections = split_into_sections(markdown_text)
+
+    # Every identifier lives in exactly one file; links to it from other files need the file name
+    pages = []
+    id_to_page = {}
+    for number, section in enumerate(sections, 1):
+        page = f"ch{number:03d}.xhtml"
+        pages.append(page)
+        for fragment in section['body']:
+            for element_id in re.findall(r' id="([^"]+)"', fragment):
+                id_to_page[element_id] = page
+
+    def local_link(page):
+        def replace(match):
+            target = id_to_page.get(match.group(1))
+            if target is None or target == page:
+                return match.group(0)
+            return f'href="{target}#{match.group(1)}"'
+        return replace
+
+    identifier = f"urn:uuid:{uuid.uuid4()}"
+    modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    escaped_title = html.escape(title)
+
+    manifest = [
+        '<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml" />',
+        '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav" />',
+        '<item id="stylesheet" href="styles/stylesheet.css" media-type="text/css" />',
+    ]
+    spine = []
+    cover_meta = ''
+    files = []
+
+    if cover_image:
+        cover_name = f"cover{os.path.splitext(cover_image)[1].lower()}"
+        media_type = mimetypes.guess_type(cover_name)[0] or 'image/png'
+        with open(cover_image, 'rb') as f:
+            files.append((f"EPUB/media/{cover_name}", f.read()))
+        cover_body = f'<section epub:type="cover"><img src="../media/{cover_name}" alt="cover image" /></section>'
+        files.append(("EPUB/text/cover.xhtml", _xhtml_document(title, cover_body, language)))
+        manifest.append(f'<item id="cover_image" href="media/{cover_name}" media-type="{media_type}" properties="cover-image" />')
+        manifest.append('<item id="cover" href="text/cover.xhtml" media-type="application/xhtml+xml" />')
+        spine.append('<itemref idref="cover" linear="no" />')
+        cover_meta = '<meta name="cover" content="cover_image" />\n'
+
+    title_body = f'<section epub:type="titlepage" class="titlepage">\n<h1 class="title">{escaped_title}</h1>\n</section>'
+    files.append(("EPUB/text/title_page.xhtml", _xhtml_document(title, title_body, language)))
+    manifest.append('<item id="title_page" href="text/title_page.xhtml" media-type="application/xhtml+xml" />')
+    spine.append('<itemref idref="title_page" />')
+
+    toc_entries = []
+    for number, (page, section) in enumerate(zip(pages, sections), 1):
+        body = LOCAL_LINK.sub(local_link(page), '\n'.join(section['body']))
+        section_title = section['headings'][0][1] if section['headings'] else title
+        files.append((f"EPUB/text/{page}", _xhtml_document(section_title, body, language, body_type='bodymatter')))
+        manifest.append(f'<item id="ch{number:03d}" href="text/{page}" media-type="application/xhtml+xml" />')
+        spine.append(f'<itemref idref="ch{number:03d}" />')
+        for level, text, heading_id in section['headings']:
+            if level <= TOC_DEPTH:
+                toc_entries.append((level, text, f"text/{page}#{heading_id}"))
+
+    toc = _nested_toc(toc_entries)
+    if not toc:
+        # The navigation document needs at least one entry
+        toc = [{'text': title, 'href': 'text/title_page.xhtml', 'children': []}]
+    nav_body = (f'<nav epub:type="toc" id="toc">\n<h1 id="toc-title">{escaped_title}</h1>\n'
+                f'{_nav_list(toc)}\n</nav>')
+    files.append(("EPUB/nav.xhtml", _xhtml_document(title, nav_body, language, stylesheet='styles/stylesheet.css')))
+
+    ncx = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">\n'
+        '<head>\n'
+        f'<meta name="dtb:uid" content="{identifier}" />\n'
+        f'<meta name="dtb:depth" content="{_depth(toc)}" />\n'
+        '<meta name="dtb:totalPageCount" content="0" />\n'
+        '<meta name="dtb:maxPageNumber" content="0" />\n'
+        '</head>\n'
+        f'<docTitle><text>{escaped_title}</text></docTitle>\n'
+        '<navMap>\n'
+        f'{_ncx_points(toc, [0])}\n'
+        '</navMap>\n'
+        '</ncx>\n'
+    )
+    files.append(("EPUB/toc.ncx", ncx))
+    files.append(("EPUB/styles/stylesheet.css", css))
+
+    opf = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="bookid" xml:lang="{language}">\n'
+        '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+        f'<dc:identifier id="bookid">{identifier}</dc:identifier>\n'
+        f'<dc:title>{escaped_title}</dc:title>\n'
+        f'<dc:language>{language}</dc:language>\n'
+        f'<meta property="dcterms:modified">{modified}</meta>\n'
+        f'{cover_meta}'
+        '</metadata>\n'
+        '<manifest>\n' + '\n'.join(manifest) + '\n</manifest>\n'
+        '<spine toc="ncx">\n' + '\n'.join(spine) + '\n</spine>\n'
+        '</package>\n'
+    )
+    files.append(("EPUB/content.opf", opf))
+
+    container = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+        '<rootfiles>\n'
+        '<rootfile full-path="EPUB/content.opf" media-type="application/oebps-package+xml" />\n'
+        '</rootfiles>\n'
+        '</container>\n'
+    )
+
+    # The mimetype entry must come first and be stored uncompressed
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as epub:
+        epub.writestr(zipfile.ZipInfo('mimetype'), 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        epub.writestr('META-INF/container.xml', container, compress_type=zipfile.ZIP_DEFLATED)
+        for name, content in files:
+            epub.writestr(name, content, compress_type=zipfile.ZIP_DEFLATED)
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, output_path)
+    return output_path
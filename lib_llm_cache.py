@@ -0,0 +1,76 @@
+"""
+Response cache for the minibook composer.
+
+This file contains an on-disk, content-addressed cache for LLM responses. Entries are keyed
+on a hash of the model, the generation settings and the fully formatted prompt, so re-running
+a topic only sends the prompts that actually changed. The cache is bounded in size and evicts
+the least recently used entries first.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from lib_disk_cache import DiskCache
+
+# Where cached responses are stored and how large the cache may grow
+DEFAULT_CACHE_FOLDER = os.path.join(os.path.expanduser("~"), ".cache", "minibook_composer", "llm")
+DEFAULT_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 200 MB
+
+
+def make_cache_key(model_name, generation_config, prompt):
+    """Build a stable cache key from the model, its generation settings and the prompt."""
+    payload = json.dumps(
+        {"model": model_name, "config": generation_config, "prompt": prompt},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(DiskCache):
+    """
+    A size-bounded LRU cache of LLM responses stored as one JSON file per entry.
+
+    Parameters:
+        cache_folder: Directory holding the cache entries
+        max_bytes: Total size above which the least recently used entries are evicted
+        enabled: If False, the cache is neither read nor written
+        refresh: If True, cached entries are ignored but new responses are still stored
+    """
+
+    extension = ".json"
+
+    def __init__(self, cache_folder=DEFAULT_CACHE_FOLDER, max_bytes=DEFAULT_CACHE_MAX_BYTES,
+                 enabled=True, refresh=False):
+        super().__init__(cache_folder, max_bytes, enabled, refresh)
+
+    def serialize(self, response, model_name=None):
+        return json.dumps({
+            "model": model_name,
+            "created_at": time.time(),
+            "response": response
+        }, ensure_ascii=False).encode("utf-8")
+
+    def deserialize(self, data):
+        return json.loads(data.decode("utf-8"))["response"]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache(cache_folder=None, max_bytes=None, enabled=True, refresh=False):
+    """
+    Return the process-wide response cache, creating it on first use.
+    Arguments only take effect when the cache is created.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                cache_folder or DEFAULT_CACHE_FOLDER,
+                max_bytes or DEFAULT_CACHE_MAX_BYTES,
+                enabled, refresh
+            )
+        return _cache
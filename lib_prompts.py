@@ -28,6 +28,14 @@ PROMPTS = {
     The outline should be comprehensive but concise, covering the most important aspects of {topic}.
     """,
     
+    # Added to the outline prompt when the outline is requested as structured JSON
+    "outline_json": """
+    
+    Return the outline as JSON instead of markdown: give the minibook "title" and a "chapters" list.
+    For each chapter provide its "number" (starting from 1), its "title" and its key concepts
+    as a "bullets" list of strings. Markdown and latex may still be used inside the strings.
+    """,
+    
     # Prompt to elaborate on a specific chapter
     "chapter_elaboration": """
     Please write a detailed chapter section for a minibook on the following topic:
@@ -0,0 +1,136 @@
+"""
+Rate limiting for the minibook composer.
+
+This file contains a token-bucket rate limiter that is shared by every Gemini call made
+from the same process. Each model gets one limiter with a requests-per-minute bucket and a
+tokens-per-minute bucket, so parallel chapters and several books running at once all draw
+from the same quota instead of relying on fixed sleeps.
+"""
+import random
+import threading
+import time
+
+# Quotas per model. Adjust these to match the limits of your API tier.
+MODEL_RATE_LIMITS = {
+    'gemini-2.5-flash-preview-04-17': {"rpm": 10, "tpm": 250000},
+    'gemini-2.5-pro-preview-05-06': {"rpm": 5, "tpm": 250000},
+    'gemini-2.0-flash': {"rpm": 15, "tpm": 1000000},
+    'gemini-2.0-flash-lite': {"rpm": 30, "tpm": 1000000},
+}
+
+# Used for models that are not listed above
+DEFAULT_RATE_LIMIT = {"rpm": 10, "tpm": 250000}
+
+# Upper bound in seconds for a single backoff wait after a 429 response
+MAX_BACKOFF_SECONDS = 60
+
+
+def estimate_tokens(text):
+    """Roughly estimate the number of tokens in a text (about 4 characters per token)."""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """A thread-safe token bucket that refills continuously up to its capacity."""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def reserve(self, amount):
+        """
+        Take `amount` tokens from the bucket and return how long the caller must wait
+        before the reservation is covered. The balance may go negative, which makes later
+        callers queue up behind this one.
+        """
+        # A request bigger than the whole bucket would never fit, so cap it at the capacity
+        amount = min(float(amount), self.capacity)
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.refill_per_second
+
+    def adjust(self, amount):
+        """Return (positive) or charge (negative) tokens after the real cost is known."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self):
+        """Empty the bucket, used when the server reports that the quota is exhausted."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for a single model."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, estimated_tokens=0):
+        """Block until one request and `estimated_tokens` tokens are available."""
+        wait_time = max(
+            self.request_bucket.reserve(1),
+            self.token_bucket.reserve(estimated_tokens),
+        )
+        with self.lock:
+            wait_time = max(wait_time, self.paused_until - time.monotonic())
+        if wait_time > 0:
+            print(f"Rate limiter: waiting {wait_time:.1f} seconds for quota...")
+            time.sleep(wait_time)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once the real token count of a call is known."""
+        if actual_tokens is not None:
+            self.token_bucket.adjust(estimated_tokens - actual_tokens)
+
+    def backoff(self, attempt, base_delay=1.0):
+        """
+        Handle a rate limit error: pause every caller sharing this limiter and return a
+        jittered wait time (full jitter exponential backoff) for the current attempt.
+        """
+        wait_time = random.uniform(base_delay, min(MAX_BACKOFF_SECONDS, base_delay * (2 ** attempt)))
+        self.request_bucket.drain()
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + wait_time)
+        return wait_time
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name, requests_per_minute=None, tokens_per_minute=None):
+    """
+    Return the shared rate limiter for a model, creating it on first use.
+    Explicit limits override the values from MODEL_RATE_LIMITS when the limiter is created.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if limiter is None:
+            limits = MODEL_RATE_LIMITS.get(model_name, DEFAULT_RATE_LIMIT)
+            limiter = RateLimiter(
+                requests_per_minute or limits["rpm"],
+                tokens_per_minute or limits["tpm"],
+            )
+            _limiters[model_name] = limiter
+        return limiter
@@ -7,11 +7,15 @@ import google.generativeai as genai
 from datetime import datetime
 import argparse
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from lib_prompts import (
     PROMPTS, get_outline_prompt, INSTRUCTION_TEMPLATES, get_instruction_templates,
     NARRATIVE_STYLES, PEDAGOGICAL_APPROACHES, apply_style_and_approach,
     get_available_styles, get_available_approaches
 )
+from lib_rate_limiter import get_rate_limiter, estimate_tokens
+from lib_llm_cache import get_response_cache, make_cache_key
 
 # Import user-specific configuration if available
 try:
@@ -48,7 +52,38 @@ PEDAGOGICAL_APPROACH = "socratic" # e.g., "scaffolded", "socratic", "project_bas
 
 NUM_CHAPTERS = 'dynamic'  # Can be a number or 'dynamic' to calculate based on instructions
 BASE_CHAPTER_COUNT = 5    # Base number of chapters when using dynamic mode
-CHAPTER_DELAY = 1  # Default wait time in seconds between chapter requests
+CHAPTER_DELAY = 0  # Extra wait in seconds between sequential chapter requests (pacing is handled by the rate limiter)
+MAX_CONCURRENCY = 4  # Number of chapters elaborated in parallel (1 = sequential)
+MERGE_BLOCK_SIZE = 64 * 1024  # Block size in characters for copying chapter files into the book
+STREAM_CHAPTERS = False  # Stream chapter responses straight into their files as they are generated
+STRUCTURED_OUTLINE = True  # Request the outline as JSON (falls back to a markdown outline on failure)
+
+# Response schema for structured outlines
+OUTLINE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "title": {"type": "STRING"},
+        "chapters": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "number": {"type": "INTEGER"},
+                    "title": {"type": "STRING"},
+                    "bullets": {"type": "ARRAY", "items": {"type": "STRING"}}
+                },
+                "required": ["number", "title", "bullets"]
+            }
+        }
+    },
+    "required": ["title", "chapters"]
+}
+CACHE_FOLDER = os.path.join(PROJECT_FOLDER, ".llm_cache")  # On-disk cache of LLM responses keyed by prompt
+CACHE_MAX_MB = 200  # Least recently used responses are evicted above this size
+
+# Placeholder texts written for chapters that could not be generated (used to detect them on resume)
+RATE_LIMIT_MESSAGE = "API rate limit exceeded. This content could not be generated."
+FAILED_CHAPTER_MARKERS = ["Error generating content", "API rate limit exceeded"]
 
 def setup_genai(api_llm_key):
     """Initialize the Gemini API with the provided API key."""
@@ -85,37 +120,149 @@ def create_project_folder(topic):
     if not os.path.exists(PROJECT_FOLDER):
         os.makedirs(PROJECT_FOLDER, exist_ok=True)
 
-    project_path = os.path.join(PROJECT_FOLDER, project_name)
-    
-    # Create project directory and subdirectories
-    os.makedirs(project_path, exist_ok=True)
+    # Create the project directory; topics of a batch that start with the same words and
+    # run in the same minute get a numbered suffix instead of sharing a folder
+    suffix = 1
+    while True:
+        project_path = os.path.join(PROJECT_FOLDER, project_name if suffix == 1 else f"{project_name}_{suffix}")
+        try:
+            os.makedirs(project_path)
+            break
+        except FileExistsError:
+            suffix += 1
     os.makedirs(os.path.join(project_path, "chapters"), exist_ok=True)
     
     return project_path
 
-def ask_gemini(model, prompt, max_retries=3, retry_delay=3):
-    """Send a prompt to Gemini and get the response."""
+class UsageStats:
+    """Thread-safe counters of the API calls and cache lookups made for one book."""
+    
+    def __init__(self):
+        self.counts = {"api_calls": 0, "cache_hits": 0, "cache_misses": 0}
+        self.lock = threading.Lock()
+    
+    def record(self, name):
+        with self.lock:
+            self.counts[name] += 1
+    
+    def as_dict(self):
+        with self.lock:
+            return dict(self.counts)
+
+def stream_response_to_file(model, prompt, generation_config, filepath):
+    """
+    Stream a Gemini response into a file, flushing each chunk as it arrives.
+    The chunks go to a .part file that only replaces the target once the stream has finished,
+    so an interrupted or failed stream never leaves a truncated chapter behind.
+    
+    Returns:
+        tuple: (full response text, usage metadata, timing metrics)
+    """
+    start = time.time()
+    first_chunk_at = None
+    chunks = []
+    part_path = f"{filepath}.part"
+    try:
+        response = model.generate_content(prompt, generation_config=generation_config, stream=True)
+        with open(part_path, 'w', encoding='utf-8') as f:
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. only safety ratings) are skipped
+                    continue
+                if first_chunk_at is None:
+                    first_chunk_at = time.time()
+                f.write(text)
+                f.flush()
+                chunks.append(text)
+        os.replace(part_path, filepath)
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    end = time.time()
+    
+    content = "".join(chunks)
+    usage = getattr(response, "usage_metadata", None)
+    output_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(content)
+    generation_time = end - (first_chunk_at or start)
+    metrics = {
+        "time_to_first_token": round((first_chunk_at or end) - start, 2),
+        "duration": round(end - start, 2),
+        "output_tokens": output_tokens,
+        "tokens_per_second": round(output_tokens / generation_time, 1) if generation_time > 0 else None
+    }
+    return content, usage, metrics
+
+def ask_gemini(model, prompt, max_retries=3, retry_delay=3, stats=None, stream_to=None, metrics=None,
+               response_mime_type="text/plain", response_schema=None):
+    """
+    Send a prompt to Gemini and get the response.
+    Identical prompts are answered from the response cache, and API calls are paced
+    through the shared rate limiter. Calls and cache lookups are counted in stats if given.
+    
+    If stream_to is a file path, the response is streamed into that file as it is generated
+    (cached and placeholder responses are written to it as well), and the timing of the
+    stream is stored in the metrics dict if one is given.
+    
+    response_mime_type and response_schema select the response format, e.g. JSON output
+    following a schema.
+    """
+    generation_config = {
+        "temperature": TEMPERATURE,
+        "top_p": TOP_P,
+        "response_mime_type": response_mime_type,
+    }
+    if response_schema:
+        generation_config["response_schema"] = response_schema
+    
+    cache = get_response_cache(CACHE_FOLDER, CACHE_MAX_MB * 1024 * 1024)
+    cache_key = make_cache_key(MODEL, generation_config, prompt)
+    cached_response = cache.get(cache_key)
+    if cached_response is not None:
+        print("Using cached response for identical prompt")
+        if stats:
+            stats.record("cache_hits")
+        if stream_to:
+            save_to_file(cached_response, stream_to)
+        return cached_response
+    if stats and cache.enabled:
+        stats.record("cache_misses")
+    
+    limiter = get_rate_limiter(MODEL)
+    estimated_tokens = estimate_tokens(prompt)
     retry_count = 0
     while retry_count <= max_retries:
+        limiter.acquire(estimated_tokens)
+        if stats:
+            stats.record("api_calls")
         try:
-            response = model.generate_content(
-                prompt,
-                generation_config={
-                    "temperature": TEMPERATURE,
-                    "top_p": TOP_P,
-                    "response_mime_type": "text/plain",
-                }
-            )
-            return response.text
+            if stream_to:
+                text, usage, stream_metrics = stream_response_to_file(model, prompt, generation_config, stream_to)
+                if metrics is not None:
+                    metrics.update(stream_metrics)
+            else:
+                response = model.generate_content(
+                    prompt,
+                    generation_config=generation_config
+                )
+                text = response.text
+                usage = getattr(response, "usage_metadata", None)
+            limiter.record_usage(estimated_tokens, getattr(usage, "total_token_count", None))
+            cache.put(cache_key, text, model_name=MODEL)
+            return text
         except Exception as e:
             if "ResourceExhausted" in str(e) or "429" in str(e):
                 retry_count += 1
-                wait_time = retry_delay * (2 ** retry_count)  # Exponential backoff
-                print(f"Rate limit reached. Waiting {wait_time} seconds before retrying...")
-                time.sleep(wait_time)
                 if retry_count > max_retries:
                     print("Maximum retries reached. Returning partial response.")
-                    return "API rate limit exceeded. This content could not be generated."
+                    if stream_to:
+                        save_to_file(RATE_LIMIT_MESSAGE, stream_to)
+                    return RATE_LIMIT_MESSAGE
+                wait_time = limiter.backoff(retry_count, retry_delay)
+                print(f"Rate limit reached. Waiting {wait_time:.1f} seconds before retrying...")
+                time.sleep(wait_time)
             else:
                 raise e
 
@@ -202,14 +349,77 @@ def generate_book_outline_prompt(topic, num_chapters, additional_instructions=No
     # Format the final prompt with topic and num_chapters
     return outline_prompt.format(topic=topic, num_chapters=actual_num_chapters)
 
+def validate_outline_json(response_text):
+    """
+    Check a structured outline response against OUTLINE_SCHEMA.
+    
+    Returns:
+        dict: {"title", "chapters": [{"number", "title", "bullets"}]}, or None if invalid
+    """
+    try:
+        data = json.loads(response_text)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("chapters"), list) or not data["chapters"]:
+        return None
+    
+    chapters = []
+    for position, chapter in enumerate(data["chapters"]):
+        if not isinstance(chapter, dict) or not isinstance(chapter.get("title"), str) or not chapter["title"].strip():
+            return None
+        bullets = chapter.get("bullets") or []
+        if not isinstance(bullets, list) or not all(isinstance(bullet, str) for bullet in bullets):
+            return None
+        # Keep the outline order authoritative so numbering is always 1..N
+        chapters.append({
+            "number": position + 1,
+            "title": chapter["title"].strip(),
+            "bullets": [bullet.strip() for bullet in bullets if bullet.strip()]
+        })
+    
+    title = data.get("title")
+    return {"title": title.strip() if isinstance(title, str) and title.strip() else "Untitled", "chapters": chapters}
+
+def render_outline_markdown(outline_data):
+    """Render a structured outline as markdown in the form parse_outline expects."""
+    lines = [f"# Minibook Title: {outline_data['title']}", ""]
+    for chapter in outline_data["chapters"]:
+        lines.append(f"## Chapter {chapter['number']}: {chapter['title']}")
+        lines.extend(f"* {bullet}" for bullet in chapter["bullets"])
+        lines.append("")
+    return "\n".join(lines)
+
 def generate_book_outline(model, topic, project_path, num_chapters, outline_instructions=None, 
-                         base_chapters=BASE_CHAPTER_COUNT):
-    """Generate a book outline for the given topic."""
+                         base_chapters=BASE_CHAPTER_COUNT, stats=None):
+    """
+    Generate a book outline for the given topic.
+    
+    With STRUCTURED_OUTLINE the outline is requested as JSON following OUTLINE_SCHEMA and
+    rendered to markdown; if the request fails or the JSON is invalid, a free-form markdown
+    outline is requested instead.
+    """
     outline_prompt = generate_book_outline_prompt(
         topic, num_chapters, outline_instructions, base_chapters
     )
     
-    outline = ask_gemini(model, outline_prompt)
+    outline = None
+    if STRUCTURED_OUTLINE:
+        try:
+            response = ask_gemini(
+                model, outline_prompt + PROMPTS["outline_json"], stats=stats,
+                response_mime_type="application/json", response_schema=OUTLINE_SCHEMA
+            )
+            outline_data = validate_outline_json(response)
+            if outline_data:
+                outline = render_outline_markdown(outline_data)
+                print(f"Received structured outline with {len(outline_data['chapters'])} chapters")
+            else:
+                print("Structured outline was not valid JSON. Falling back to a markdown outline.")
+        except Exception as e:
+            print(f"Structured outline request failed: {str(e)}. Falling back to a markdown outline.")
+    
+    if outline is None:
+        outline = ask_gemini(model, outline_prompt, stats=stats)
     
     # Save the outline
     outline_path = os.path.join(project_path, "outline.md")
@@ -217,86 +427,103 @@ def generate_book_outline(model, topic, project_path, num_chapters, outline_inst
     
     return outline
 
-def parse_chapters(outline):
-    """Parse the outline to extract chapters."""
-    chapters = []
-    
-    # Look for chapter headings with various patterns
-    # First try to find numbered chapter patterns like "Chapter 1:" or "1. Chapter:"
-    chapter_patterns = [
-        r'#+\s*Chapter\s+\d+[:.]\s*(.*?)(?=\n)',  # "## Chapter 1: Title"
-        r'#+\s*\d+[:.]\s*Chapter[:.]\s*(.*?)(?=\n)',  # "## 1. Chapter: Title"
-        r'#+\s*\d+[:.]\s*(.*?)(?=\n)',  # "## 1. Title"
-        r'\*\*(\d+)\.\s*Chapter\s+\d*[:.]\s*(.*?)\*\*',  # "**1. Chapter 1: Title**"
-        r'\*\*Chapter\s+(\d+)[:.]\s*(.*?)\*\*',  # "**Chapter 1: Title**"
-        r'\*\*(\d+)[:.]\s*(.*?)\*\*'  # "**1. Title**"
-    ]
-    
-    # Check if we have a "Minibook Title" at the beginning
-    title_match = re.search(r'#+\s*Minibook Title[:.]\s*(.*?)(?=\n)', outline, re.IGNORECASE)
-    book_title = title_match.group(1).strip() if title_match else "Untitled"
-    
-    # Try each pattern until we find matches
-    all_matches = []
-    for pattern in chapter_patterns:
-        matches = re.findall(pattern, outline, re.IGNORECASE | re.DOTALL)
-        if matches:
-            # Handle different match group structures
-            if isinstance(matches[0], tuple):
-                # Some patterns return tuples (e.g., when there are multiple capture groups)
-                matches = [m[-1] for m in matches]  # Get the last group which should be the title
-            all_matches.extend(matches)
-            break
+# Chapter heading patterns for parse_outline, in order of preference. Each pattern is matched
+# against a single line; the first kind found anywhere in the outline decides how chapters are
+# delimited, so only headings of that kind start a new chapter.
+CHAPTER_HEADING_PATTERNS = [
+    re.compile(r'^\s*#+\s*Chapter\s+(\d+)[:.]\s*(.*)$', re.IGNORECASE),  # "## Chapter 1: Title"
+    re.compile(r'^\s*#+\s*(\d+)[:.]\s*Chapter[:.]\s*(.*)$', re.IGNORECASE),  # "## 1. Chapter: Title"
+    re.compile(r'^\s*#+\s*(\d+)[:.]\s*(.*)$', re.IGNORECASE),  # "## 1. Title"
+    re.compile(r'\*\*(\d+)\.\s*Chapter\s+\d*[:.]\s*(.*?)\*\*', re.IGNORECASE),  # "**1. Chapter 1: Title**"
+    re.compile(r'\*\*Chapter\s+(\d+)[:.]\s*(.*?)\*\*', re.IGNORECASE),  # "**Chapter 1: Title**"
+    re.compile(r'\*\*(\d+)[:.]\s*(.*?)\*\*', re.IGNORECASE),  # "**1. Title**"
+]
+# Last resort: any second-level heading that is not a known non-chapter section
+PLAIN_HEADING_PATTERN = re.compile(r'^##\s+(.*)$')
+NON_CHAPTER_HEADINGS = ['minibook title', 'table of contents', 'introduction', 'conclusion', 
+                        'overview', 'summary', 'about']
+BOOK_TITLE_PATTERN = re.compile(r'^\s*#+\s*Minibook Title[:.]\s*(.*)$', re.IGNORECASE)
+BULLET_PATTERN = re.compile(r'^\s*[*+-]\s+(.*)$')
+
+def parse_outline(outline):
+    """
+    Parse the outline in a single pass over its lines.
+    
+    Returns:
+        dict: {"title": book title, "chapters": [{"number", "title", "bullets", "start", "end"}]}
+              where start/end are the byte offsets of each chapter section in the UTF-8 outline.
+    """
+    book_title = None
+    # Candidate headings per pattern kind: (line index, byte offset, number, title)
+    candidates = [[] for _ in range(len(CHAPTER_HEADING_PATTERNS) + 1)]
+    lines = outline.splitlines(keepends=True)
+    line_offsets = []
+    offset = 0
+    
+    for line_index, line in enumerate(lines):
+        line_offsets.append(offset)
+        offset += len(line.encode('utf-8'))
+        text = line.rstrip('\r\n')
+        
+        if book_title is None:
+            title_match = BOOK_TITLE_PATTERN.match(text)
+            if title_match:
+                book_title = title_match.group(1).strip()
+        
+        for kind, pattern in enumerate(CHAPTER_HEADING_PATTERNS):
+            match = pattern.search(text)
+            if match:
+                candidates[kind].append((line_index, line_offsets[-1], int(match.group(1)), match.group(2).strip()))
+                break
+        else:
+            plain_match = PLAIN_HEADING_PATTERN.match(text)
+            if plain_match:
+                heading = plain_match.group(1).strip()
+                if not any(x in heading.lower() for x in NON_CHAPTER_HEADINGS):
+                    candidates[-1].append((line_index, line_offsets[-1], None, heading))
     
-    # If no matches found with chapter patterns, look for any numbered sections
-    if not all_matches:
-        # Look for "**N. Title**" pattern commonly used in outlines
-        matches = re.findall(r'\*\*(\d+)[:.]\s*(.*?)\*\*', outline)
-        if matches:
-            all_matches = [title for _, title in matches]
-    
-    # If still no matches, try to find any headings
-    if not all_matches:
-        # Look for markdown headings that aren't the title
-        headings = re.findall(r'##\s+(.*?)(?=\n)', outline)
-        # Filter out common non-chapter headings
-        filtered_headings = [h for h in headings if not any(x in h.lower() for x in 
-                             ['minibook title', 'table of contents', 'introduction', 'conclusion', 
-                              'overview', 'summary', 'about'])]
-        all_matches = filtered_headings
+    total_bytes = offset
+    line_offsets.append(total_bytes)
+    headings = next((found for found in candidates if found), [])
     
-    # Process each chapter
-    chapter_content_parts = []
-    for i, title in enumerate(all_matches):
-        # Try to find the content for this chapter
-        title_pattern = re.escape(title.strip())
-        
-        # Find where this chapter starts in the text
-        title_pos = re.search(title_pattern, outline, re.IGNORECASE)
-        if not title_pos:
-            content = ""  # No content found
+    chapters = []
+    for position, (line_index, start, number, title) in enumerate(headings):
+        if position + 1 < len(headings):
+            end_line, end = headings[position + 1][0], headings[position + 1][1]
         else:
-            start_pos = title_pos.end()
-            
-            # Find the next chapter title or end of text
-            if i < len(all_matches) - 1:
-                next_title = re.escape(all_matches[i+1].strip())
-                next_pos = re.search(next_title, outline[start_pos:], re.IGNORECASE)
-                if next_pos:
-                    content = outline[start_pos:start_pos + next_pos.start()].strip()
-                else:
-                    content = outline[start_pos:].strip()
-            else:
-                # Last chapter
-                content = outline[start_pos:].strip()
+            end_line, end = len(lines), total_bytes
         
-        # Look for bullet points after the title
-        bullet_points = re.findall(r'^\s*\*\s*(.*?)$', content, re.MULTILINE)
-        if bullet_points:
-            content = "\n".join([f"* {point}" for point in bullet_points])
+        bullets = []
+        for line in lines[line_index + 1:end_line]:
+            bullet_match = BULLET_PATTERN.match(line.rstrip('\r\n'))
+            if bullet_match:
+                bullets.append(bullet_match.group(1).strip())
         
         chapters.append({
-            "title": title.strip(),
+            "number": number if number is not None else position + 1,
+            "title": title,
+            "bullets": bullets,
+            "body": "".join(lines[line_index + 1:end_line]).strip(),
+            "start": start,
+            "end": end
+        })
+    
+    return {"title": book_title or "Untitled", "chapters": chapters}
+
+def parse_chapters(outline, parsed_outline=None):
+    """Parse the outline to extract chapters."""
+    if parsed_outline is None:
+        parsed_outline = parse_outline(outline)
+    
+    chapters = []
+    for record in parsed_outline["chapters"]:
+        # Use the bullet points as the chapter outline if there are any
+        if record["bullets"]:
+            content = "\n".join(f"* {point}" for point in record["bullets"])
+        else:
+            content = record["body"]
+        chapters.append({
+            "title": record["title"],
             "outline": content
         })
     
@@ -304,15 +531,27 @@ def parse_chapters(outline):
     if not chapters and outline:
         # Use the whole outline as a single chapter
         chapters.append({
-            "title": book_title,
+            "title": parsed_outline["title"],
             "outline": outline
         })
     
     return chapters
 
-def elaborate_chapter(model, chapter, project_path, index, delay=CHAPTER_DELAY, 
-                     narrative_style=None, pedagogical_approach=None, chapter_instructions=None):
-    """Generate detailed content for a chapter based on its outline, and return the prompt used."""
+def save_outline_json(parsed_outline, project_path):
+    """Save the structured outline next to outline.md."""
+    outline_json_path = os.path.join(project_path, "outline.json")
+    with open(outline_json_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "title": parsed_outline["title"],
+            "chapters": [
+                {key: record[key] for key in ("number", "title", "bullets", "start", "end")}
+                for record in parsed_outline["chapters"]
+            ]
+        }, f, indent=2, ensure_ascii=False)
+    print(f"Saved to {outline_json_path}")
+
+def build_chapter_prompt(chapter, index, narrative_style=None, pedagogical_approach=None, chapter_instructions=None):
+    """Build the full elaboration prompt for a chapter."""
     chapter_title = chapter["title"]
     chapter_outline = chapter["outline"]
     
@@ -344,71 +583,192 @@ def elaborate_chapter(model, chapter, project_path, index, delay=CHAPTER_DELAY,
             formatted_prompt += "\n\nAdditional chapter instructions:\n" + chapter_instructions
     
     # Apply narrative style and pedagogical approach if specified
-    final_prompt = apply_style_and_approach(formatted_prompt, narrative_style, pedagogical_approach)
+    return apply_style_and_approach(formatted_prompt, narrative_style, pedagogical_approach)
+
+def elaborate_chapter(model, chapter, project_path, index, delay=CHAPTER_DELAY, 
+                     narrative_style=None, pedagogical_approach=None, chapter_instructions=None, prompt=None,
+                     stats=None):
+    """
+    Generate detailed content for a chapter based on its outline, and return the prompt used.
+    If a prompt is given (e.g. one saved by an earlier run) it is used as is.
+    """
+    chapter_title = chapter["title"]
+    final_prompt = prompt or build_chapter_prompt(
+        chapter, index, narrative_style, pedagogical_approach, chapter_instructions
+    )
     
     # Add a delay before each API call to avoid rate limiting
     if delay > 0:
         print(f"Waiting {delay} seconds before requesting content for Chapter {index+1}...")
         time.sleep(delay)
     
-    chapter_content = ask_gemini(model, final_prompt)
-    
     # Create chapter filename
     safe_chapter_title = sanitize_filename(chapter_title)
     chapter_filename = f"chapter_{index+1}_{safe_chapter_title}.md"
     chapter_path = os.path.join(project_path, "chapters", chapter_filename)
     
-    # Save chapter content
-    save_to_file(chapter_content, chapter_path)
+    metrics = None
+    if STREAM_CHAPTERS:
+        # Stream the chapter straight into its file; the merge reads it back from disk,
+        # so the content is not kept in memory afterwards
+        metrics = {}
+        ask_gemini(model, final_prompt, stats=stats, stream_to=chapter_path, metrics=metrics)
+        chapter_content = None
+        print(f"Saved to {chapter_path}")
+        if metrics:
+            print(f"Chapter {index+1} streamed: first token after {metrics['time_to_first_token']}s, "
+                  f"{metrics['tokens_per_second']} tokens/sec")
+    else:
+        chapter_content = ask_gemini(model, final_prompt, stats=stats)
+        
+        # Save chapter content
+        save_to_file(chapter_content, chapter_path)
     
     # Also save the prompt used for this chapter for debugging purposes
     prompt_filename = f"prompt_{index+1}_{safe_chapter_title}.txt"
     prompt_path = os.path.join(project_path, "chapters", prompt_filename)
     save_to_file(final_prompt, prompt_path)
     
-    return {
+    processed_chapter = {
         "title": chapter_title,
         "content": chapter_content,
         "file": chapter_path,
         "prompt": final_prompt,
         "prompt_file": prompt_path
     }
+    if metrics:
+        processed_chapter["metrics"] = metrics
+    return processed_chapter
 
-def merge_chapters(chapters, topic, project_path, output_folder=None):
-    """Merge all chapter contents into a single markdown file."""
-    book_title = f"# Minibook: {topic}\n\n"
-    toc = "## Table of Contents\n\n"
-    
-    # Build table of contents
-    for i, chapter in enumerate(chapters):
-        toc += f"{i+1}. [{chapter['title']}](#chapter-{i+1})\n"
-    
-    toc += "\n---\n\n"
+def save_chapter_error(chapter, project_path, index, error):
+    """Write placeholder chapter and prompt files for a chapter that failed to generate."""
+    safe_chapter_title = sanitize_filename(chapter["title"])
+    chapter_filename = f"chapter_{index+1}_{safe_chapter_title}.md"
+    chapter_path = os.path.join(project_path, "chapters", chapter_filename)
+    error_content = f"# {chapter['title']}\n\nError generating content: {str(error)}\n\nOutline:\n{chapter['outline']}"
+    save_to_file(error_content, chapter_path)
     
-    # Build book content
-    book_content = book_title + toc
+    # Also create a placeholder for the failed prompt
+    prompt_filename = f"prompt_{index+1}_{safe_chapter_title}.txt" 
+    prompt_path = os.path.join(project_path, "chapters", prompt_filename)
+    error_prompt = f"Error generating prompt: {str(error)}\n\nOutline that would have been used:\n{chapter['outline']}"
+    save_to_file(error_prompt, prompt_path)
     
-    for i, chapter in enumerate(chapters):
-        book_content += f"<a name='chapter-{i+1}'></a>\n\n"
-        
-        # Check if the content already starts with the chapter heading
-        chapter_heading = f"## Chapter {i+1}: {chapter['title']}"
-        chapter_content = chapter['content']
-        
+    return {
+        "title": chapter["title"],
+        "content": error_content,
+        "file": chapter_path,
+        "prompt": "Error generating prompt due to: " + str(error),
+        "prompt_file": prompt_path
+    }
+
+def elaborate_chapters(model, chapters, project_path, delay=CHAPTER_DELAY, narrative_style=None, 
+                       pedagogical_approach=None, chapter_instructions=None, max_concurrency=MAX_CONCURRENCY,
+                       indices=None, prompts=None, stats=None, executor=None, on_chapter=None):
+    """
+    Elaborate chapters, optionally in parallel, and return them in outline order.
+    
+    With max_concurrency > 1 every chapter prompt is submitted to a thread pool at once and
+    each chapter file is written as soon as its response arrives. The per-chapter delay only
+    applies to sequential mode, where it spaces out consecutive requests.
+    
+    indices restricts elaboration to those chapter positions (default: all chapters), and
+    prompts maps a chapter position to a ready-made prompt to reuse. If an executor is given
+    (batch mode), chapters are queued on it instead of on a pool owned by this call.
+    on_chapter(index, processed_chapter) is called as soon as each chapter is written, which
+    lets later stages (e.g. audio) start before the whole book is done.
+    """
+    if indices is None:
+        indices = list(range(len(chapters)))
+    prompts = prompts or {}
+    
+    def process(i):
+        chapter = chapters[i]
+        print(f"Elaborating on Chapter {i+1}: {chapter['title']}")
+        try:
+            processed_chapter = elaborate_chapter(
+                model, chapter, project_path, i, delay if max_concurrency <= 1 else 0,
+                narrative_style, pedagogical_approach, chapter_instructions, prompts.get(i), stats
+            )
+        except Exception as e:
+            print(f"Error processing chapter {i+1}: {str(e)}")
+            return save_chapter_error(chapter, project_path, i, e)
+        if on_chapter:
+            try:
+                on_chapter(i, processed_chapter)
+            except Exception as e:
+                # Errors of later stages are reported but do not abort the book
+                print(f"Error handing on chapter {i+1}: {str(e)}")
+        return processed_chapter
+    
+    def collect(pool):
+        results = {}
+        futures = {pool.submit(process, i): i for i in indices}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            print(f"Chapter {i+1} finished ({len(results)}/{len(indices)})")
+        return [results[i] for i in indices]
+    
+    if executor is not None:
+        return collect(executor)
+    
+    if max_concurrency <= 1 or len(indices) <= 1:
+        return [process(i) for i in indices]
+    
+    workers = min(max_concurrency, len(indices))
+    print(f"Elaborating {len(indices)} chapters with up to {workers} concurrent requests")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return collect(pool)
+
+def write_chapter_content(out, chapter, chapter_heading):
+    """
+    Write one chapter into an open book file, adding the chapter heading if it is missing.
+    Chapters that only exist on disk (streamed chapters) are copied over in blocks.
+    """
+    chapter_content = chapter.get('content')
+    if chapter_content is not None:
         # If the content doesn't already start with the correct chapter heading, add it
         if not chapter_content.strip().startswith(chapter_heading):
-            book_content += f"{chapter_heading}\n\n"
-        
-        book_content += chapter_content
-        book_content += "\n\n---\n\n"
+            out.write(f"{chapter_heading}\n\n")
+        out.write(chapter_content)
+        return
+    
+    with open(chapter['file'], 'r', encoding='utf-8') as f:
+        # The beginning of the file is enough to check for the heading
+        head = f.read(len(chapter_heading) + MERGE_BLOCK_SIZE)
+        if not head.lstrip().startswith(chapter_heading):
+            out.write(f"{chapter_heading}\n\n")
+        out.write(head)
+        shutil.copyfileobj(f, out, MERGE_BLOCK_SIZE)
+
+def merge_chapters(chapters, topic, project_path, output_folder=None):
+    """
+    Merge all chapter contents into a single markdown file.
     
+    The title, table of contents and chapters are written straight into the book file, so
+    the complete book is never held in memory, and the copy in output_folder is a file copy.
+    """
     # Create the final book filename
     safe_topic = sanitize_filename(topic)
     book_filename = f"minibook_{safe_topic}.md"
-    
-    # Save the complete book in the project folder
     book_path = os.path.join(project_path, book_filename)
-    save_to_file(book_content, book_path)
+    
+    with open(book_path, 'w', encoding='utf-8') as out:
+        out.write(f"# Minibook: {topic}\n\n")
+        
+        # Write table of contents
+        out.write("## Table of Contents\n\n")
+        for i, chapter in enumerate(chapters):
+            out.write(f"{i+1}. [{chapter['title']}](#chapter-{i+1})\n")
+        out.write("\n---\n\n")
+        
+        # Write the chapters
+        for i, chapter in enumerate(chapters):
+            out.write(f"<a name='chapter-{i+1}'></a>\n\n")
+            write_chapter_content(out, chapter, f"## Chapter {i+1}: {chapter['title']}")
+            out.write("\n\n---\n\n")
+    print(f"Saved to {book_path}")
     
     # Also save to output folder if specified
     if output_folder:
@@ -420,8 +780,8 @@ def merge_chapters(chapters, topic, project_path, output_folder=None):
         output_filename = f"minibook_{safe_topic}_{timestamp}.md"
         output_path = os.path.join(output_folder, output_filename)
         
-        # Save to output folder
-        save_to_file(book_content, output_path)
+        # Copy the finished book to the output folder
+        shutil.copyfile(book_path, output_path)
         print(f"Final book also saved to: {output_path}")
         
         # Return both paths
@@ -430,8 +790,14 @@ def merge_chapters(chapters, topic, project_path, output_folder=None):
     return book_path
 
 def save_metadata(topic, project_path, chapters, outline_prompt=None, instructions=None, 
-                 num_chapters=None, narrative_style=None, pedagogical_approach=None):
-    """Save metadata about the project for future reference."""
+                 num_chapters=None, narrative_style=None, pedagogical_approach=None, usage_stats=None,
+                 chapter_delay=None, max_concurrency=None, resumed=False):
+    """
+    Save metadata about the project for future reference.
+    chapter_delay and max_concurrency are the values the chapters are elaborated with
+    (default: the module settings). With resumed=True, instruction lists may hold the texts
+    saved by the original run, which are kept as they are.
+    """
     metadata = {
         "topic": topic,
         "created_at": datetime.now().isoformat(),
@@ -441,7 +807,8 @@ def save_metadata(topic, project_path, chapters, outline_prompt=None, instructio
                 "title": chapter["title"],
                 "file": os.path.basename(chapter["file"]),
                 "prompt": chapter.get("prompt", "Prompt not captured"),
-                "prompt_file": os.path.basename(chapter.get("prompt_file", ""))
+                "prompt_file": os.path.basename(chapter.get("prompt_file", "")),
+                **({"metrics": chapter["metrics"]} if chapter.get("metrics") else {})
             }
             for chapter in chapters
         ],
@@ -450,7 +817,10 @@ def save_metadata(topic, project_path, chapters, outline_prompt=None, instructio
         "top_p": TOP_P,
         "settings": {
             "num_chapters": num_chapters or NUM_CHAPTERS,
-            "chapter_delay": CHAPTER_DELAY,
+            "chapter_delay": CHAPTER_DELAY if chapter_delay is None else chapter_delay,
+            "max_concurrency": MAX_CONCURRENCY if max_concurrency is None else max_concurrency,
+            "stream_chapters": STREAM_CHAPTERS,
+            "structured_outline": STRUCTURED_OUTLINE,
             "narrative_style": narrative_style,
             "pedagogical_approach": pedagogical_approach
         }
@@ -472,6 +842,8 @@ def save_metadata(topic, project_path, chapters, outline_prompt=None, instructio
                     for key in instructions["outline"]:
                         if key in INSTRUCTION_TEMPLATES:
                             outline_instr.append(INSTRUCTION_TEMPLATES[key])
+                        elif resumed:
+                            outline_instr.append(key)
                     metadata["instructions"]["outline"] = outline_instr
                 elif isinstance(instructions["outline"], str):
                     metadata["instructions"]["outline"] = instructions["outline"]
@@ -483,6 +855,8 @@ def save_metadata(topic, project_path, chapters, outline_prompt=None, instructio
                     for key in instructions["chapter"]:
                         if key in INSTRUCTION_TEMPLATES:
                             chapter_instr.append(INSTRUCTION_TEMPLATES[key])
+                        elif resumed:
+                            chapter_instr.append(key)
                     metadata["instructions"]["chapter"] = chapter_instr
                 elif isinstance(instructions["chapter"], str):
                     metadata["instructions"]["chapter"] = instructions["chapter"]
@@ -499,6 +873,10 @@ def save_metadata(topic, project_path, chapters, outline_prompt=None, instructio
             # String instructions
             metadata["instructions"] = instructions
     
+    # Include API call and response cache counters if available
+    if usage_stats:
+        metadata["usage"] = usage_stats
+    
     # Include the outline prompt if available
     if outline_prompt:
         metadata["outline_prompt"] = outline_prompt
@@ -517,8 +895,15 @@ def save_metadata(topic, project_path, chapters, outline_prompt=None, instructio
 def create_minibook(topic, api_llm_key, num_chapters, chapter_delay=CHAPTER_DELAY, 
                    output_folder=OUTPUT_FOLDER, add_summary=True, outline_instructions=None, 
                    chapter_instructions=None, base_chapters=BASE_CHAPTER_COUNT, 
-                   narrative_style=None, pedagogical_approach=None):
-    """Main function to create a minibook on the given topic."""
+                   narrative_style=None, pedagogical_approach=None, max_concurrency=MAX_CONCURRENCY,
+                   model=None, executor=None, stats=None, on_chapter=None):
+    """
+    Main function to create a minibook on the given topic.
+    
+    Batch mode passes in a shared model, a shared executor for all LLM jobs and a
+    UsageStats object to collect this book's API usage. on_chapter is passed on to
+    elaborate_chapters to hand each finished chapter to a later stage.
+    """
     if not api_llm_key:
         raise ValueError("Please provide a Google API key (for LLM) either as an argument or by setting the GOOGLE_API_KEY environment variable or in config.py.")
     
@@ -535,7 +920,10 @@ def create_minibook(topic, api_llm_key, num_chapters, chapter_delay=CHAPTER_DELA
             actual_num_chapters = base_chapters
     
     # Initialize Gemini model
-    model = setup_genai(api_llm_key)
+    if model is None:
+        model = setup_genai(api_llm_key)
+    if stats is None:
+        stats = UsageStats()
     
     # Create project folder
     project_path = create_project_folder(topic)
@@ -546,47 +934,38 @@ def create_minibook(topic, api_llm_key, num_chapters, chapter_delay=CHAPTER_DELA
     outline_prompt = generate_book_outline_prompt(
         topic, actual_num_chapters, outline_instructions, base_chapters
     )
-    outline = generate_book_outline(
-        model, topic, project_path, actual_num_chapters, 
-        outline_instructions, base_chapters
-    )
+    if executor is not None:
+        # Queue the outline request with the other LLM jobs of the batch
+        outline = executor.submit(
+            generate_book_outline, model, topic, project_path, actual_num_chapters,
+            outline_instructions, base_chapters, stats
+        ).result()
+    else:
+        outline = generate_book_outline(
+            model, topic, project_path, actual_num_chapters, 
+            outline_instructions, base_chapters, stats
+        )
     
     # Parse chapters from outline
-    chapters = parse_chapters(outline)
+    parsed_outline = parse_outline(outline)
+    save_outline_json(parsed_outline, project_path)
+    chapters = parse_chapters(outline, parsed_outline)
     print(f"Extracted {len(chapters)} chapters from outline")
     
+    # Save preliminary metadata so an interrupted run can be resumed with --resume
+    save_metadata(
+        topic, project_path, [], outline_prompt, 
+        {"outline": outline_instructions, "chapter": chapter_instructions}, 
+        actual_num_chapters, narrative_style, pedagogical_approach,
+        chapter_delay=chapter_delay, max_concurrency=max_concurrency
+    )
+    
     # Process each chapter
-    processed_chapters = []
-    for i, chapter in enumerate(chapters):
-        print(f"Elaborating on Chapter {i+1}: {chapter['title']}")
-        try:
-            processed_chapter = elaborate_chapter(
-                model, chapter, project_path, i, chapter_delay,
-                narrative_style, pedagogical_approach, chapter_instructions
-            )
-            processed_chapters.append(processed_chapter)
-        except Exception as e:
-            print(f"Error processing chapter {i+1}: {str(e)}")
-            # Create a placeholder for the failed chapter
-            safe_chapter_title = sanitize_filename(chapter["title"])
-            chapter_filename = f"chapter_{i+1}_{safe_chapter_title}.md"
-            chapter_path = os.path.join(project_path, "chapters", chapter_filename)
-            error_content = f"# {chapter['title']}\n\nError generating content: {str(e)}\n\nOutline:\n{chapter['outline']}"
-            save_to_file(error_content, chapter_path)
-            
-            # Also create a placeholder for the failed prompt
-            prompt_filename = f"prompt_{i+1}_{safe_chapter_title}.txt" 
-            prompt_path = os.path.join(project_path, "chapters", prompt_filename)
-            error_prompt = f"Error generating prompt: {str(e)}\n\nOutline that would have been used:\n{chapter['outline']}"
-            save_to_file(error_prompt, prompt_path)
-            
-            processed_chapters.append({
-                "title": chapter["title"],
-                "content": error_content,
-                "file": chapter_path,
-                "prompt": "Error generating prompt due to: " + str(e),
-                "prompt_file": prompt_path
-            })
+    processed_chapters = elaborate_chapters(
+        model, chapters, project_path, chapter_delay,
+        narrative_style, pedagogical_approach, chapter_instructions, max_concurrency,
+        stats=stats, executor=executor, on_chapter=on_chapter
+    )
     
     # Merge chapters into complete book
     print("Merging chapters into final book")
@@ -600,11 +979,14 @@ def create_minibook(topic, api_llm_key, num_chapters, chapter_delay=CHAPTER_DELA
         output_path = None
     
     # Save project metadata
+    usage = stats.as_dict()
     save_metadata(
         topic, project_path, processed_chapters, outline_prompt, 
         {"outline": outline_instructions, "chapter": chapter_instructions}, 
-        actual_num_chapters, narrative_style, pedagogical_approach
+        actual_num_chapters, narrative_style, pedagogical_approach, usage,
+        chapter_delay=chapter_delay, max_concurrency=max_concurrency
     )
+    print(f"API calls: {usage['api_calls']}, response cache: {usage['cache_hits']} hits, {usage['cache_misses']} misses")
     
     print(f"\nMinibook creation complete!")
     print(f"Project folder: {project_path}")
@@ -614,12 +996,253 @@ def create_minibook(topic, api_llm_key, num_chapters, chapter_delay=CHAPTER_DELA
     
     return project_path, book_path
 
+def is_failed_chapter(content):
+    """Check whether a saved chapter is missing real content (empty or an error placeholder)."""
+    if not content or not content.strip():
+        return True
+    head = content[:1000]
+    return any(marker in head for marker in FAILED_CHAPTER_MARKERS)
+
+def load_project_chapters(project_path):
+    """
+    Read the chapter and prompt files saved in a project folder.
+    
+    Returns:
+        dict: chapter position (0-based) -> {"file", "content", "prompt", "prompt_file"}
+    """
+    chapters_dir = os.path.join(project_path, "chapters")
+    saved = {}
+    if not os.path.isdir(chapters_dir):
+        return saved
+    
+    for filename in os.listdir(chapters_dir):
+        match = re.match(r'^(chapter|prompt)_(\d+)_.*\.(md|txt)$', filename)
+        if not match:
+            continue
+        kind, index = match.group(1), int(match.group(2)) - 1
+        with open(os.path.join(chapters_dir, filename), 'r', encoding='utf-8') as f:
+            text = f.read()
+        entry = saved.setdefault(index, {})
+        if kind == "chapter":
+            entry["file"] = os.path.join(chapters_dir, filename)
+            entry["content"] = text
+        else:
+            entry["prompt_file"] = os.path.join(chapters_dir, filename)
+            # Placeholder prompts from failed chapters cannot be reused
+            if not text.startswith("Error generating prompt"):
+                entry["prompt"] = text
+    
+    return saved
+
+def resume_minibook(project_path, api_llm_key, topic=None, output_folder=OUTPUT_FOLDER,
+                    narrative_style=None, pedagogical_approach=None, chapter_instructions=None,
+                    max_concurrency=MAX_CONCURRENCY, chapter_delay=None):
+    """
+    Resume an interrupted minibook from its project folder.
+    
+    The saved outline is parsed again and only chapters that are missing or contain an error
+    placeholder are elaborated, reusing their saved prompts where available. The book is then
+    merged and the metadata saved as in create_minibook. Settings recorded in metadata.json take
+    precedence over the arguments, which are used for projects without metadata. The chapter
+    delay is the exception: an explicit chapter_delay wins over the saved one.
+    """
+    if not api_llm_key:
+        raise ValueError("Please provide a Google API key (for LLM) either as an argument or by setting the GOOGLE_API_KEY environment variable or in config.py.")
+    
+    outline_path = os.path.join(project_path, "outline.md")
+    if not os.path.exists(outline_path):
+        raise FileNotFoundError(f"No outline.md found in {project_path}, nothing to resume.")
+    with open(outline_path, 'r', encoding='utf-8') as f:
+        outline = f.read()
+    
+    # Recover the settings of the original run
+    metadata = {}
+    metadata_path = os.path.join(project_path, "metadata.json")
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    settings = metadata.get("settings", {})
+    topic = metadata.get("topic") or topic
+    narrative_style = settings.get("narrative_style", narrative_style)
+    pedagogical_approach = settings.get("pedagogical_approach", pedagogical_approach)
+    num_chapters = settings.get("num_chapters")
+    if chapter_delay is None:
+        chapter_delay = settings.get("chapter_delay", CHAPTER_DELAY)
+    outline_prompt = metadata.get("outline_prompt")
+    
+    # Metadata stores the expanded instruction texts; joined as a bullet list they rebuild
+    # exactly the same prompt section as the original template keys
+    outline_instructions = None
+    saved_instructions = metadata.get("instructions")
+    if isinstance(saved_instructions, dict):
+        saved_outline = saved_instructions.get("outline")
+        saved_chapter = saved_instructions.get("chapter")
+        if isinstance(saved_outline, list):
+            outline_instructions = "\n".join("- " + text for text in saved_outline)
+        elif saved_outline:
+            outline_instructions = saved_outline
+        if isinstance(saved_chapter, list):
+            chapter_instructions = "\n".join("- " + text for text in saved_chapter)
+        elif saved_chapter:
+            chapter_instructions = saved_chapter
+    # The metadata written at the end keeps the saved instructions in their original shape
+    metadata_instructions = {"outline": outline_instructions, "chapter": chapter_instructions}
+    if isinstance(saved_instructions, dict):
+        metadata_instructions = {
+            "outline": saved_instructions.get("outline") or outline_instructions,
+            "chapter": saved_instructions.get("chapter") or chapter_instructions
+        }
+    
+    print(f"Resuming project: {project_path} (topic: {topic})")
+    
+    chapters = parse_chapters(outline)
+    saved = load_project_chapters(project_path)
+    pending = [i for i in range(len(chapters))
+               if i not in saved or is_failed_chapter(saved[i].get("content"))]
+    print(f"Outline has {len(chapters)} chapters, {len(chapters) - len(pending)} already complete, "
+          f"{len(pending)} to elaborate")
+    
+    # Collect the chapters that are already done
+    processed = {}
+    for i in range(len(chapters)):
+        if i in pending:
+            continue
+        processed[i] = {
+            "title": chapters[i]["title"],
+            "content": saved[i]["content"],
+            "file": saved[i]["file"],
+            "prompt": saved[i].get("prompt", "Prompt not captured"),
+            "prompt_file": saved[i].get("prompt_file", "")
+        }
+    
+    model = setup_genai(api_llm_key)
+    stats = UsageStats()
+    
+    if pending:
+        prompts = {i: saved[i]["prompt"] for i in pending if "prompt" in saved.get(i, {})}
+        elaborated = elaborate_chapters(
+            model, chapters, project_path, chapter_delay,
+            narrative_style, pedagogical_approach, chapter_instructions, max_concurrency,
+            indices=pending, prompts=prompts, stats=stats
+        )
+        for i, chapter in zip(pending, elaborated):
+            processed[i] = chapter
+    
+    processed_chapters = [processed[i] for i in range(len(chapters))]
+    
+    print("Merging chapters into final book")
+    result = merge_chapters(processed_chapters, topic, project_path, output_folder)
+    if isinstance(result, tuple):
+        book_path, output_path = result
+    else:
+        book_path = result
+        output_path = None
+    
+    save_metadata(
+        topic, project_path, processed_chapters, outline_prompt, metadata_instructions,
+        num_chapters, narrative_style, pedagogical_approach, stats.as_dict(),
+        chapter_delay=chapter_delay, max_concurrency=max_concurrency, resumed=True
+    )
+    print(f"\nMinibook resume complete!")
+    print(f"Project folder: {project_path}")
+    print(f"Final book: {book_path}")
+    if output_path:
+        print(f"Output copy: {output_path}")
+    
+    return project_path, book_path
+
+def read_topics_file(topics_file):
+    """Read one topic per line, skipping blank lines, markdown headings and duplicates."""
+    topics = []
+    with open(topics_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            topic = line.strip()
+            if topic and not topic.startswith('#') and topic not in topics:
+                topics.append(topic)
+    return topics
+
+def create_minibooks_batch(topics, api_llm_key, num_chapters, chapter_delay=CHAPTER_DELAY, 
+                           output_folder=OUTPUT_FOLDER, add_summary=True, outline_instructions=None, 
+                           chapter_instructions=None, base_chapters=BASE_CHAPTER_COUNT, 
+                           narrative_style=None, pedagogical_approach=None, max_concurrency=MAX_CONCURRENCY):
+    """
+    Create minibooks for many topics in one process.
+    
+    A single model client is shared by all books, and the outline and chapter requests of
+    every book go through one work queue of max_concurrency workers, so the total number of
+    requests in flight is capped across the whole batch. A summary with the status, duration
+    and API usage of each book is saved in PROJECT_FOLDER.
+    
+    Returns:
+        list: One summary entry per topic, in the order of the topics
+    """
+    if not api_llm_key:
+        raise ValueError("Please provide a Google API key (for LLM) either as an argument or by setting the GOOGLE_API_KEY environment variable or in config.py.")
+    
+    model = setup_genai(api_llm_key)
+    batch_start = time.time()
+    print(f"Starting batch of {len(topics)} books with up to {max_concurrency} concurrent requests")
+    
+    def run_book(topic):
+        stats = UsageStats()
+        start = time.time()
+        entry = {"topic": topic}
+        try:
+            project_path, book_path = create_minibook(
+                topic, api_llm_key, num_chapters, chapter_delay, output_folder, add_summary,
+                outline_instructions, chapter_instructions, base_chapters,
+                narrative_style, pedagogical_approach, max_concurrency,
+                model=model, executor=llm_executor, stats=stats
+            )
+            entry.update({"status": "ok", "project_path": project_path, "book_path": book_path})
+        except Exception as e:
+            print(f"Error creating minibook for '{topic}': {str(e)}")
+            entry.update({"status": "error", "error": str(e)})
+        entry["duration_seconds"] = round(time.time() - start, 1)
+        entry.update(stats.as_dict())
+        return entry
+    
+    summary = [None] * len(topics)
+    # Book-level work (outline parsing, merging, saving) runs on its own threads, which only
+    # wait on the shared LLM queue, so the two pools can never deadlock each other
+    with ThreadPoolExecutor(max_workers=max_concurrency) as llm_executor, \
+         ThreadPoolExecutor(max_workers=max_concurrency) as book_executor:
+        futures = {book_executor.submit(run_book, topic): i for i, topic in enumerate(topics)}
+        for done, future in enumerate(as_completed(futures), 1):
+            entry = future.result()
+            summary[futures[future]] = entry
+            print(f"[{done}/{len(topics)}] {entry['status']}: {entry['topic']} ({entry['duration_seconds']}s)")
+    
+    # Save the batch summary
+    os.makedirs(PROJECT_FOLDER, exist_ok=True)
+    timestamp = datetime.now().strftime("%y%m%d_%H%M")
+    summary_path = os.path.join(PROJECT_FOLDER, f"batch_summary_{timestamp}.json")
+    succeeded = sum(1 for entry in summary if entry["status"] == "ok")
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "created_at": datetime.now().isoformat(),
+            "duration_seconds": round(time.time() - batch_start, 1),
+            "books": len(topics),
+            "succeeded": succeeded,
+            "failed": len(topics) - succeeded,
+            "api_calls": sum(entry["api_calls"] for entry in summary),
+            "max_concurrency": max_concurrency,
+            "results": summary
+        }, f, indent=2)
+    
+    print(f"\nBatch complete: {succeeded}/{len(topics)} books created in {time.time() - batch_start:.0f} seconds")
+    print(f"Batch summary: {summary_path}")
+    
+    return summary
+
 # For direct execution in IDE, uncomment and modify these lines:
 # topic = "Introduction to Blockchain Technology"
 # api_key = "your-api-key-here"  # Or use environment variable
 # create_minibook(topic, api_key)
 
 def main():
+    global STREAM_CHAPTERS, STRUCTURED_OUTLINE
+    
     # Get all available narrative styles and pedagogical approaches
     narrative_styles = get_available_styles()
     pedagogical_approaches = get_available_approaches()
@@ -633,8 +1256,27 @@ def main():
                         help=f'The suggested number of chapters to produce in the outline (default: {NUM_CHAPTERS}). Can be a number or "dynamic"')
     parser.add_argument('--base-chapters', type=int, default=BASE_CHAPTER_COUNT,
                         help=f'Base number of chapters when using dynamic mode (default: {BASE_CHAPTER_COUNT})')
-    parser.add_argument('--chapter-delay', type=int, default=CHAPTER_DELAY,
-                        help=f'Wait time in seconds between chapter requests (default: {CHAPTER_DELAY})')
+    parser.add_argument('--chapter-delay', type=int, default=None,
+                        help=f'Wait time in seconds between chapter requests (default: {CHAPTER_DELAY}, '
+                             f'or the delay saved in the project with --resume)')
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENCY,
+                        help=f'Number of chapters to elaborate in parallel, 1 for sequential (default: {MAX_CONCURRENCY})')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream chapter responses into their files as they are generated')
+    parser.add_argument('--markdown-outline', action='store_true',
+                        help='Request a free-form markdown outline instead of a structured JSON outline')
+    parser.add_argument('--requests-per-minute', type=int,
+                        help='Override the requests-per-minute quota for the model (default: from MODEL_RATE_LIMITS)')
+    parser.add_argument('--tokens-per-minute', type=int,
+                        help='Override the tokens-per-minute quota for the model (default: from MODEL_RATE_LIMITS)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Do not read or write the LLM response cache')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Ignore cached responses but store the new ones in the cache')
+    parser.add_argument('--topics-file', type=str,
+                        help='Create one minibook per line of this file in a single batch run')
+    parser.add_argument('--resume', type=str, metavar='PROJECT_PATH',
+                        help='Resume an interrupted book from its project folder, only elaborating missing or failed chapters')
     parser.add_argument('--output-folder', type=str, default=OUTPUT_FOLDER,
                         help=f'Folder to store final markdown files (default: {OUTPUT_FOLDER})')
     parser.add_argument('--no-summary', action='store_true',
@@ -696,10 +1338,42 @@ def main():
     
     # Note: CUSTOM_INSTRUCTIONS will be added in generate_book_outline_prompt regardless
     
+    if args.stream:
+        STREAM_CHAPTERS = True
+    if args.markdown_outline:
+        STRUCTURED_OUTLINE = False
+    
+    # Create the shared rate limiter up front so command-line quota overrides apply to every call
+    get_rate_limiter(MODEL, args.requests_per_minute, args.tokens_per_minute)
+    
+    # Likewise create the response cache with the requested cache mode
+    get_response_cache(CACHE_FOLDER, CACHE_MAX_MB * 1024 * 1024, not args.no_cache, args.refresh)
+    
+    chapter_delay = CHAPTER_DELAY if args.chapter_delay is None else args.chapter_delay
+    
+    if args.topics_file:
+        topics = read_topics_file(args.topics_file)
+        create_minibooks_batch(
+            topics, args.api_key, args.num_chapters, chapter_delay, 
+            args.output_folder, not args.no_summary, outline_instructions, chapter_instructions,
+            args.base_chapters, args.narrative_style, args.pedagogical_approach,
+            args.max_concurrency
+        )
+        return
+    
+    if args.resume:
+        resume_minibook(
+            args.resume, args.api_key, args.topic, args.output_folder,
+            args.narrative_style, args.pedagogical_approach, chapter_instructions,
+            args.max_concurrency, args.chapter_delay
+        )
+        return
+    
     create_minibook(
-        args.topic, args.api_key, args.num_chapters, args.chapter_delay, 
+        args.topic, args.api_key, args.num_chapters, chapter_delay, 
         args.output_folder, not args.no_summary, outline_instructions, chapter_instructions,
-        args.base_chapters, args.narrative_style, args.pedagogical_approach
+        args.base_chapters, args.narrative_style, args.pedagogical_approach,
+        args.max_concurrency
     )
 
 if __name__ == "__main__":
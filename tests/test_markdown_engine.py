@@ -0,0 +1,32 @@
+import glob
+import os
+
+import pytest
+
+import util_tts
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_FILES = sorted(glob.glob(os.path.join(REPO_ROOT, "TestFiles", "*.md")))
+
+EDGE_CASES = [
+    "Key Features\n\n### 1. AI-Powered Content Generation\n\n- **Requirement**: Generate books",
+    "Intro\n\n1. First\n2. Second\n\nAfter",
+    "## Heading\n\nText with **bold** and *italic*.",
+]
+
+
+@pytest.fixture(autouse=True)
+def markdown_rules(monkeypatch):
+    monkeypatch.setattr(util_tts, "MARKDOWN_RULES_FILE", os.path.join(REPO_ROOT, "markdown_rules.json"))
+
+
+@pytest.mark.parametrize("path", TEST_FILES, ids=os.path.basename)
+def test_fast_engine_matches_rules_on_test_files(path):
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    assert util_tts.markdown_to_speech(content) == util_tts.preprocess_markdown_with_rules(content)
+
+
+@pytest.mark.parametrize("content", EDGE_CASES)
+def test_fast_engine_matches_rules_on_edge_cases(content):
+    assert util_tts.markdown_to_speech(content) == util_tts.preprocess_markdown_with_rules(content)
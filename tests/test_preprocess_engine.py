@@ -0,0 +1,32 @@
+import glob
+import os
+
+import pytest
+
+from util_md_to_epub_converter import fix_markdown_formatting, fix_markdown_formatting_fast
+
+TEST_FILES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "TestFiles", "*.md")))
+
+EDGE_CASES = [
+    "a\n*\nb",
+    "x\n*\n* item",
+    "*",
+    " * \n\n* a",
+    "text\n* one\n\n* two\n\n* three\nafter",
+    "*no space\n*emphasis* here\n**bold** line",
+    "\n \n*a\n* b",
+    "a __DOUBLE_STAR__ b __SINGLE_STAR__",
+    "line\r\n* item\r\n",
+]
+
+
+@pytest.mark.parametrize("path", TEST_FILES, ids=os.path.basename)
+def test_fast_engine_matches_regex_passes_on_test_files(path):
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    assert fix_markdown_formatting_fast(content) == fix_markdown_formatting(content)
+
+
+@pytest.mark.parametrize("content", EDGE_CASES)
+def test_fast_engine_matches_regex_passes_on_edge_cases(content):
+    assert fix_markdown_formatting_fast(content) == fix_markdown_formatting(content)
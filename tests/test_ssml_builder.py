@@ -0,0 +1,27 @@
+from util_tts import RuleSet, SSMLBuilder
+
+
+def build(rules, text):
+    return SSMLBuilder(RuleSet(rules)).build(text)
+
+
+def test_alternation_rule_matches_every_branch():
+    rules = [{"type": "regex", "pattern": r"Dr\.|Mr\.", "replacement": "<sub alias=\"title\">T</sub>"}]
+    assert build(rules, "Dr. A and Mr. B") == '<speak><sub alias="title">T</sub> A and <sub alias="title">T</sub> B</speak>'
+
+
+def test_optional_escaped_first_atom():
+    rules = [{"type": "regex", "pattern": r"\.?!", "replacement": "<break time=\"300ms\"/>"}]
+    assert build(rules, "Who! Yes.!") == '<speak>Who<break time="300ms"/> Yes<break time="300ms"/></speak>'
+
+
+def test_first_char_is_only_used_when_required():
+    assert SSMLBuilder._first_char(r"Dr\.") == "D"
+    assert SSMLBuilder._first_char(r"\.\.\.") == "."
+    assert SSMLBuilder._first_char(r"(Dr|Mr)\.") is None
+    assert SSMLBuilder._first_char(r"a|b") is None
+    assert SSMLBuilder._first_char(r"[|]x") is None
+    assert SSMLBuilder._first_char(r"x[|]") == "x"
+    assert SSMLBuilder._first_char(r"x(a|b)") == "x"
+    assert SSMLBuilder._first_char(r"x{0,2}y") is None
+    assert SSMLBuilder._first_char(r"x{2}y") == "x"
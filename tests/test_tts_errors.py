@@ -0,0 +1,39 @@
+import base64
+import os
+
+import requests
+
+import util_tts
+from lib_audio_cache import AudioCache
+
+PLACEHOLDER_AUDIO = b"placeholder audio"
+
+
+class FailingClient:
+    """Answers the chapter text with a 500 error and the error message with audio."""
+
+    def synthesize(self, payload):
+        response = requests.models.Response()
+        text = payload["input"].get("text") or payload["input"].get("ssml")
+        if "There was an error processing this text" in text:
+            response.status_code = 200
+            response._content = ('{"audioContent": "%s"}' % base64.b64encode(PLACEHOLDER_AUDIO).decode()).encode()
+        else:
+            response.status_code = 500
+            response.reason = "Internal Server Error"
+            response._content = b'{"error": "backend"}'
+        return response
+
+
+def test_http_error_writes_placeholder_audio(tmp_path, monkeypatch):
+    monkeypatch.setattr(util_tts, "PROJECT_FOLDER", str(tmp_path))
+    monkeypatch.setattr(util_tts, "API_TTS_KEY", "key")
+    monkeypatch.setattr(util_tts, "MOCK_MODE", False)
+    monkeypatch.setattr(util_tts, "_tts_client", FailingClient())
+    monkeypatch.setattr(util_tts, "get_audio_cache", lambda *args: AudioCache(str(tmp_path / "cache"), enabled=False))
+
+    output_path = util_tts.synthesize_text_to_file("Some chapter text.", "chapter.mp3", save_text=False)
+
+    assert os.path.basename(output_path) == "chapter.mp3"
+    with open(output_path, "rb") as f:
+        assert f.read() == PLACEHOLDER_AUDIO
@@ -14,6 +14,13 @@ from pathlib import Path
 import shutil
 import tempfile
 import re
+import json
+import time
+import hashlib
+import threading
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from lib_epub import build_epub, UnsupportedMarkdown
 
 # Import user-specific configuration if available
 try:
@@ -27,6 +34,69 @@ except ImportError:
     DEFAULT_INPUT_DIR = os.path.join(os.path.expanduser("~"), "Documents/Minibooks")
     DEFAULT_OUTPUT_DIR = DEFAULT_INPUT_DIR
 
+# Cover image added to every EPUB if it exists in the working directory
+COVER_IMAGE = 'cover.png'
+
+# Options passed to pandoc for every conversion
+PANDOC_OPTIONS = [
+    '--toc',  # Add table of contents
+    '--standalone',
+    '--wrap=none',  # Prevent pandoc from rewrapping text
+    '--markdown-headings=atx'  # Use # style headings consistently
+]
+
+# Stylesheet embedded in every EPUB
+EPUB_CSS = """
+        body {
+            font-family: serif;
+            margin: 5%;
+            text-align: justify;
+        }
+        h1, h2, h3, h4, h5, h6 {
+            font-family: sans-serif;
+            margin-top: 2em;
+        }
+        /* Fix for bullet points */
+        ul {
+            display: block;
+            list-style-type: disc;
+            margin-top: 1em;
+            margin-bottom: 1em;
+            padding-left: 40px;
+        }
+        li {
+            display: list-item;
+            margin-bottom: 0.5em;
+            padding-left: 5px;
+        }
+        ol {
+            display: block;
+            list-style-type: decimal;
+            margin-top: 1em;
+            margin-bottom: 1em;
+            padding-left: 40px;
+        }
+        /* Additional list styling for better compatibility */
+        ul li:before {
+            content: "";
+            margin-right: 0;
+        }
+        """
+
+# EPUB writer: 'pandoc' runs pandoc, 'native' builds the EPUB in-process and falls back to
+# pandoc for markdown it does not support
+EPUB_ENGINE = 'pandoc'
+
+# Bullet point preprocessing: 'regex' runs the original substitution passes over the whole
+# text, 'fast' gives the same result in a single scan over the lines
+PREPROCESS_ENGINE = 'regex'
+
+# Pass the preprocessed markdown to pandoc through temporary files instead of its stdin
+USE_TEMP_FILES = False
+
+# Build manifest kept in each output directory to skip books that have not changed
+BUILD_MANIFEST_FILE = 'epub_manifest.json'
+
 def check_pandoc_installed():
     """Check if pandoc is installed on the system."""
     try:
@@ -39,21 +109,120 @@ def check_pandoc_installed():
     except FileNotFoundError:
         return False
 
-def preprocess_markdown(input_file, output_file=None):
+# Patterns used by fix_markdown_formatting_fast, applied to one line at a time
+DOUBLE_STAR_EMPHASIS = re.compile(r'(?<!\*)\*\*(?!\s)(.+?)(?<!\s)\*\*(?!\*)')
+SINGLE_STAR_EMPHASIS = re.compile(r'(?<!\*)\*(?!\s|\*)(.+?)(?<!\s|\*)\*(?!\*)')
+SPACED_BULLET = re.compile(r'(\s*)\*\s+')
+BULLET_WITH_TEXT = re.compile(r'(\s*)\*\s+([^\n]+)')
+UNSPACED_BULLET = re.compile(r'(\s*)\*[^\s*]')
+# A line holding only a bullet marker, where the passes' \s+ runs on into the following lines
+BARE_BULLET = re.compile(r'^[^\S\n]*\*[^\S\n]*$', re.MULTILINE)
+
+def fix_markdown_formatting_fast(content):
     """
-    Preprocess markdown file to fix common formatting issues with bullet points.
+    Single-scan version of fix_markdown_formatting's substitution passes, with the same output.
+    
+    The passes pair up consecutive bullets (lines starting with "* ", separated only by blank
+    lines) from the top: the marker spacing of each pair is normalized to "* ", and a blank
+    line is added before every bullet that follows text, except before the second bullet of a
+    pair. Lines starting with "*" directly followed by text that is not emphasis become bullets.
+    Text with a line holding only a "*" is left to the regex passes, which join such a marker
+    with the lines after it, and so is text containing their emphasis placeholders.
     
     Args:
-        input_file (str): Path to the input markdown file
-        output_file (str, optional): Path to save the preprocessed file. If None, 
-                                     a temporary file will be created.
+        content (str): The markdown text
     
     Returns:
-        str: Path to the preprocessed file
+        str: The fixed markdown text
     """
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+    if BARE_BULLET.search(content) or '__DOUBLE_STAR__' in content or '__SINGLE_STAR__' in content:
+        return fix_markdown_formatting_regex(content)
+    
+    lines = content.split('\n')
+    result = []
+    blank_after = set()  # Indexes in result followed by an added blank line
+    last_text = None  # Index of the last line with non-whitespace content
+    first_filled = None  # Index of the first whitespace-only but non-empty line before any text
+    spacing_candidate = None  # Bullet waiting for a second bullet to normalize its marker with
+    spacing_pair = None  # Bullet waiting for a second bullet that needs no blank line before it
+    
+    for line in lines:
+        if not line.strip():
+            if line and last_text is None and first_filled is None:
+                first_filled = len(result)
+            result.append(line)
+            continue
+        
+        # Normalize the marker spacing of pairs of bullets
+        spaced = SPACED_BULLET.match(line)
+        if spaced and spacing_candidate is not None:
+            first = BULLET_WITH_TEXT.match(result[spacing_candidate])
+            result[spacing_candidate] = f"{first.group(1)}* {first.group(2)}"
+            line = f"{spaced.group(1)}* {line[spaced.end():]}"
+            spacing_candidate = None
+        elif spaced and BULLET_WITH_TEXT.match(line):
+            spacing_candidate = len(result)
+        else:
+            spacing_candidate = None
+        
+        # Add the missing space after a bullet marker unless the star starts an emphasis
+        if not spaced:
+            unspaced = UNSPACED_BULLET.match(line)
+            if unspaced:
+                star = unspaced.end(1)
+                protected = DOUBLE_STAR_EMPHASIS.sub(r'__DOUBLE_STAR__\1__DOUBLE_STAR__', line)
+                if not SINGLE_STAR_EMPHASIS.match(protected, star):
+                    line = f"{line[:star]}* {line[star + 1:]}"
+                    spaced = True
+        
+        # Separate bullets from the text before them, keeping pairs of bullets together
+        if spaced:
+            if spacing_pair is not None:
+                spacing_pair = None
+            else:
+                previous = last_text if last_text is not None else first_filled
+                if previous is not None:
+                    blank_after.add(previous)
+                spacing_pair = len(result) if BULLET_WITH_TEXT.match(line) else None
+        else:
+            spacing_pair = None
+        
+        last_text = len(result)
+        result.append(line)
+    
+    if not blank_after:
+        return '\n'.join(result)
+    output = []
+    for index, line in enumerate(result):
+        output.append(line)
+        if index in blank_after:
+            output.append('')
+    return '\n'.join(output)
+
+def fix_markdown_formatting(content):
+    """
+    Fix common formatting issues with bullet points in markdown text.
     
+    Args:
+        content (str): The markdown text
+    
+    Returns:
+        str: The fixed markdown text
+    """
+    if PREPROCESS_ENGINE == 'fast':
+        return fix_markdown_formatting_fast(content)
+    return fix_markdown_formatting_regex(content)
+
+def fix_markdown_formatting_regex(content):
+    """
+    Fix bullet points with a cascade of substitution passes over the whole text.
+    
+    Args:
+        content (str): The markdown text
+    
+    Returns:
+        str: The fixed markdown text
+    """
     # First, protect bold/italic markers by replacing them temporarily
     # Find patterns like *word* or **word** that are used for emphasis, not bullets
     content = re.sub(r'(?<!\*)\*\*(?!\s)(.+?)(?<!\s)\*\*(?!\*)', r'__DOUBLE_STAR__\1__DOUBLE_STAR__', content)
@@ -81,6 +250,22 @@ def preprocess_markdown(input_file, output_file=None):
     # Restore bold/italic markers
     content = content.replace('__DOUBLE_STAR__', '**')
     content = content.replace('__SINGLE_STAR__', '*')
+    return content
+
+def preprocess_markdown(input_file, output_file=None):
+    """
+    Preprocess markdown file to fix common formatting issues with bullet points.
+    
+    Args:
+        input_file (str): Path to the input markdown file
+        output_file (str, optional): Path to save the preprocessed file. If None, 
+                                     a temporary file will be created.
+    
+    Returns:
+        str: Path to the preprocessed file
+    """
+    with open(input_file, 'r', encoding='utf-8') as f:
+        content = fix_markdown_formatting(f.read())
     
     # Create a temporary file if output_file is not specified
     if not output_file:
@@ -93,18 +278,121 @@ def preprocess_markdown(input_file, output_file=None):
     
     return output_file
 
-def convert_md_to_epub(md_file, output_dir=DEFAULT_OUTPUT_DIR, title=None):
+def epub_fingerprint(md_file, title, engine=EPUB_ENGINE):
+    """
+    Hash everything an EPUB is built from: the markdown content, the CSS, the cover image
+    and the converter settings.
     """
-    Convert a markdown file to EPUB format using pandoc.
+    digest = hashlib.sha256()
+    with open(md_file, 'rb') as f:
+        digest.update(f.read())
+    digest.update(EPUB_CSS.encode('utf-8'))
+    if os.path.exists(COVER_IMAGE):
+        with open(COVER_IMAGE, 'rb') as f:
+            digest.update(f.read())
+    digest.update(json.dumps([title, PANDOC_OPTIONS, engine, PREPROCESS_ENGINE]).encode('utf-8'))
+    return digest.hexdigest()
+
+class BuildManifest:
+    """
+    The epub_manifest.json of an output directory: the fingerprint each EPUB was built from.
+    """
+    
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, BUILD_MANIFEST_FILE)
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable build manifest {self.path}: {e}")
+    
+    def is_current(self, epub_file, fingerprint):
+        """Return True if the EPUB exists and was built from the same fingerprint."""
+        with self.lock:
+            entry = self.entries.get(epub_file)
+        return (entry is not None and entry.get('fingerprint') == fingerprint
+                and os.path.exists(os.path.join(self.output_dir, epub_file)))
+    
+    def record(self, epub_file, fingerprint, md_file):
+        """Remember the fingerprint of a successfully built EPUB."""
+        with self.lock:
+            self.entries[epub_file] = {
+                'fingerprint': fingerprint,
+                'source': os.path.abspath(md_file),
+                'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            # Write to a temporary file first so an interrupted run never leaves a broken manifest
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+_build_manifests = {}
+_build_manifests_lock = threading.Lock()
+
+def get_build_manifest(output_dir):
+    """Return the build manifest of an output directory, shared by all conversion threads."""
+    key = os.path.abspath(output_dir)
+    with _build_manifests_lock:
+        if key not in _build_manifests:
+            _build_manifests[key] = BuildManifest(output_dir)
+        return _build_manifests[key]
+
+_css_file = None
+_css_file_lock = threading.Lock()
+
+def get_css_file():
+    """
+    Return the path of a stylesheet file with EPUB_CSS, written once per process and shared by
+    all pandoc runs. It is removed when the process exits.
+    """
+    global _css_file
+    with _css_file_lock:
+        if _css_file is None or not os.path.exists(_css_file):
+            fd, _css_file = tempfile.mkstemp(suffix='.css')
+            with os.fdopen(fd, 'w') as f:
+                f.write(EPUB_CSS)
+            atexit.register(lambda path=_css_file: os.path.exists(path) and os.remove(path))
+        return _css_file
+
+def convert_md_to_epub_natively(md_file, output_path, title):
+    """
+    Build an EPUB in-process with lib_epub, without pandoc or temporary files.
+    
+    Returns:
+        str: Path to the generated EPUB file, or None if the markdown needs pandoc
+    """
+    with open(md_file, 'r', encoding='utf-8') as f:
+        content = fix_markdown_formatting(f.read())
+    try:
+        build_epub(content, output_path, title, EPUB_CSS,
+                   COVER_IMAGE if os.path.exists(COVER_IMAGE) else None)
+    except UnsupportedMarkdown as e:
+        print(f"Native engine cannot convert {md_file} ({e}), using pandoc instead.")
+        return None
+    print(f"Successfully created: {output_path}")
+    return output_path
+
+def convert_md_to_epub(md_file, output_dir=DEFAULT_OUTPUT_DIR, title=None, force=False, engine=None):
+    """
+    Convert a markdown file to EPUB format using pandoc or the native writer.
     
     Args:
         md_file (str): Path to the markdown file
         output_dir (str, optional): Directory to save the EPUB file. If None, save in same directory.
         title (str, optional): Title for the EPUB. If None, use the filename without extension.
+        force (bool): Rebuild the EPUB even if the build manifest shows it is up to date.
+        engine (str, optional): 'pandoc' or 'native'. Defaults to EPUB_ENGINE.
         
     Returns:
         str: Path to the generated EPUB file, or None if conversion failed
     """
+    engine = engine or EPUB_ENGINE
     if not os.path.exists(md_file):
         print(f"Error: File {md_file} does not exist.")
         return None
@@ -123,72 +411,55 @@ def convert_md_to_epub(md_file, output_dir=DEFAULT_OUTPUT_DIR, title=None):
         output_path = os.path.join(output_dir, f"{file_name_without_ext}.epub")
     else:
         output_path = os.path.join(os.path.dirname(md_file), f"{file_name_without_ext}.epub")
+    
+    # Skip the book if its EPUB was built from the same content and settings
+    manifest = get_build_manifest(os.path.dirname(output_path) or '.')
+    fingerprint = epub_fingerprint(md_file, title, engine)
+    if not force and manifest.is_current(os.path.basename(output_path), fingerprint):
+        print(f"Up to date, skipping: {output_path}")
+        return output_path
+    
+    if engine == 'native':
+        try:
+            if convert_md_to_epub_natively(md_file, output_path, title):
+                manifest.record(os.path.basename(output_path), fingerprint, md_file)
+                return output_path
+        except Exception as e:
+            print(f"Native engine failed on {md_file} ({e}), using pandoc instead.")
         
     # Preprocess the markdown file to fix formatting issues
     preprocessed_file = None
     css_file = None
     
     try:
-        # Preprocess the markdown file
-        preprocessed_file = preprocess_markdown(md_file)
-        print(f"Preprocessed markdown file created: {preprocessed_file}")
-        
-        # Create a temporary CSS file for styling
-        css_content = """
-        body {
-            font-family: serif;
-            margin: 5%;
-            text-align: justify;
-        }
-        h1, h2, h3, h4, h5, h6 {
-            font-family: sans-serif;
-            margin-top: 2em;
-        }
-        /* Fix for bullet points */
-        ul {
-            display: block;
-            list-style-type: disc;
-            margin-top: 1em;
-            margin-bottom: 1em;
-            padding-left: 40px;
-        }
-        li {
-            display: list-item;
-            margin-bottom: 0.5em;
-            padding-left: 5px;
-        }
-        ol {
-            display: block;
-            list-style-type: decimal;
-            margin-top: 1em;
-            margin-bottom: 1em;
-            padding-left: 40px;
-        }
-        /* Additional list styling for better compatibility */
-        ul li:before {
-            content: "";
-            margin-right: 0;
-        }
-        """
-        
-        # Create a temporary CSS file
-        fd, css_file = tempfile.mkstemp(suffix='.css')
-        with os.fdopen(fd, 'w') as f:
-            f.write(css_content)
+        if USE_TEMP_FILES:
+            # Preprocess the markdown file
+            preprocessed_file = preprocess_markdown(md_file)
+            print(f"Preprocessed markdown file created: {preprocessed_file}")
+            
+            # Create a temporary CSS file for styling
+            fd, css_file = tempfile.mkstemp(suffix='.css')
+            with os.fdopen(fd, 'w') as f:
+                f.write(EPUB_CSS)
+            markdown_input = None
+        else:
+            # Preprocess in memory; pandoc reads the result from its stdin
+            with open(md_file, 'r', encoding='utf-8') as f:
+                markdown_input = fix_markdown_formatting(f.read())
         
-        # Build the pandoc command with CSS styling - use the preprocessed file
+        # Build the pandoc command with CSS styling - use the preprocessed file or stdin
         cmd = [
             'pandoc',
-            preprocessed_file,  # Use preprocessed file instead of original
+            preprocessed_file if USE_TEMP_FILES else None,  # Use preprocessed file instead of original
+            '-f', 'markdown',
             '-o', output_path,
             '--metadata', f'title={title}',
-            '--epub-cover-image=cover.png' if os.path.exists('cover.png') else None,
-            '--toc',  # Add table of contents
-            '--standalone',
-            '--css', css_file,  # Apply our custom CSS
-            '--wrap=none',  # Prevent pandoc from rewrapping text
-            '--markdown-headings=atx'  # Use # style headings consistently
-        ]
+            f'--epub-cover-image={COVER_IMAGE}' if os.path.exists(COVER_IMAGE) else None,
+            '--css', css_file or get_css_file(),  # Apply our custom CSS
+            # Markdown read from stdin has no location, so point pandoc at the source folder
+            # for relative images and other resources (as well as the working directory)
+            None if USE_TEMP_FILES else f'--resource-path={os.path.dirname(os.path.abspath(md_file))}{os.pathsep}.',
+        ] + PANDOC_OPTIONS
         
         # Remove None values
         cmd = [c for c in cmd if c is not None]
@@ -196,13 +467,15 @@ def convert_md_to_epub(md_file, output_dir=DEFAULT_OUTPUT_DIR, title=None):
         # Run pandoc
         print(f"Converting {md_file} to EPUB...")
         result = subprocess.run(cmd, 
+                              input=markdown_input,
                               stdout=subprocess.PIPE, 
                               stderr=subprocess.PIPE, 
-                              text=True, 
+                              encoding='utf-8', 
                               check=False)
         
         if result.returncode == 0:
             print(f"Successfully created: {output_path}")
+            manifest.record(os.path.basename(output_path), fingerprint, md_file)
             return output_path
         else:
             print(f"Error converting {md_file}:")
@@ -218,7 +491,39 @@ def convert_md_to_epub(md_file, output_dir=DEFAULT_OUTPUT_DIR, title=None):
         if css_file and os.path.exists(css_file):
             os.remove(css_file)
 
-def scan_and_convert(input_dir, output_dir=None, recursive=False):
+def convert_file_safely(md_file, output_dir=None, force=False, engine=None):
+    """Convert one markdown file, returning None instead of raising if anything goes wrong."""
+    try:
+        return convert_md_to_epub(md_file, output_dir, force=force, engine=engine)
+    except Exception as e:
+        print(f"Exception occurred while converting {md_file}: {e}")
+        return None
+
+def epub_output_dirs(md_files, input_dir, output_dir):
+    """
+    Return the output directory of each markdown file. Files from different subdirectories
+    that would write the same EPUB into output_dir go to matching subdirectories of it instead,
+    so parallel conversions never share an output file or build manifest entry.
+    """
+    if not output_dir:
+        # EPUBs are written next to their markdown files, which never collide
+        return [output_dir] * len(md_files)
+    names = {}
+    for md_file in md_files:
+        name = os.path.normcase(os.path.splitext(os.path.basename(md_file))[0])
+        names[name] = names.get(name, 0) + 1
+    output_dirs = []
+    for md_file in md_files:
+        name = os.path.normcase(os.path.splitext(os.path.basename(md_file))[0])
+        if names[name] > 1:
+            relative_dir = os.path.relpath(os.path.dirname(md_file), input_dir)
+            output_dirs.append(os.path.normpath(os.path.join(output_dir, relative_dir)))
+            print(f"Several files are named {os.path.basename(md_file)}, writing {md_file} to {output_dirs[-1]}")
+        else:
+            output_dirs.append(output_dir)
+    return output_dirs
+
+def scan_and_convert(input_dir, output_dir=None, recursive=False, jobs=None, force=False, engine=None):
     """
     Scan a directory for markdown files and convert them to EPUB.
     
@@ -226,6 +531,9 @@ def scan_and_convert(input_dir, output_dir=None, recursive=False):
         input_dir (str): Directory to scan for markdown files
         output_dir (str, optional): Directory to save EPUB files
         recursive (bool): Whether to scan subdirectories
+        jobs (int, optional): Number of files converted in parallel. Defaults to the CPU count.
+        force (bool): Rebuild every EPUB, even those that are up to date.
+        engine (str, optional): 'pandoc' or 'native'. Defaults to EPUB_ENGINE.
         
     Returns:
         int: Number of successfully converted files
@@ -249,17 +557,33 @@ def scan_and_convert(input_dir, output_dir=None, recursive=False):
         print(f"No markdown files found in {input_dir}.")
         return 0
     
-    print(f"Found {len(md_files)} markdown files.")
+    md_files.sort()
+    total = len(md_files)
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    print(f"Found {total} markdown files. Converting with {min(jobs, total)} parallel jobs.")
+    output_dirs = epub_output_dirs(md_files, input_dir, output_dir)
     
-    # Convert each file
+    # Convert the files in a pool of pandoc runs; results are reported in file order
     success_count = 0
-    for md_file in md_files:
-        if convert_md_to_epub(md_file, output_dir):
-            success_count += 1
+    failed_files = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(convert_file_safely, md_files, output_dirs, [force] * total, [engine] * total)
+        for index, (md_file, epub_path) in enumerate(zip(md_files, results), 1):
+            if epub_path:
+                success_count += 1
+                print(f"[{index}/{total}] OK: {md_file}")
+            else:
+                failed_files.append(md_file)
+                print(f"[{index}/{total}] FAILED: {md_file}")
+    
+    print(f"\nSummary: {success_count} succeeded, {len(failed_files)} failed out of {total} files.")
+    for md_file in failed_files:
+        print(f"  Failed: {md_file}")
     
     return success_count
 
 def main():
+    global USE_TEMP_FILES, PREPROCESS_ENGINE
     parser = argparse.ArgumentParser(description='Convert markdown files to EPUB format.')
     parser.add_argument('input_dir', nargs='?', default=DEFAULT_INPUT_DIR,
                         help=f'Directory containing markdown files (default: {DEFAULT_INPUT_DIR})')
@@ -270,18 +594,34 @@ def main():
     parser.add_argument('--single-file', '-s', 
                         help='Convert a single markdown file instead of scanning a directory')
     parser.add_argument('--title', '-t', help='Title for the EPUB (only used with --single-file)')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count(),
+                        help=f'Number of files to convert in parallel (default: CPU count, {os.cpu_count()})')
+    parser.add_argument('--force', '-f', action='store_true',
+                        help='Rebuild all EPUB files, even those whose markdown, CSS, cover and settings are unchanged')
+    parser.add_argument('--preprocess-engine', choices=['regex', 'fast'], default=PREPROCESS_ENGINE,
+                        help=f"Bullet point preprocessing: 'fast' fixes the markdown in a single scan over its lines (default: {PREPROCESS_ENGINE})")
+    parser.add_argument('--temp-files', action='store_true',
+                        help='Write the preprocessed markdown and the CSS to temporary files for every book instead of piping them to pandoc')
+    parser.add_argument('--engine', choices=['pandoc', 'native'], default=EPUB_ENGINE,
+                        help=f"EPUB writer: 'native' builds the EPUB in-process and uses pandoc only for markdown it does not support (default: {EPUB_ENGINE})")
     
     args = parser.parse_args()
     
-    # Check if pandoc is installed
+    if args.temp_files:
+        USE_TEMP_FILES = True
+    PREPROCESS_ENGINE = args.preprocess_engine
+    
+    # Check if pandoc is installed (the native engine only needs it as a fallback)
     if not check_pandoc_installed():
-        print("Error: pandoc is not installed or not in the system PATH.")
-        print("Please install pandoc (https://pandoc.org/installing.html) and try again.")
-        sys.exit(1)
+        if args.engine != 'native':
+            print("Error: pandoc is not installed or not in the system PATH.")
+            print("Please install pandoc (https://pandoc.org/installing.html) and try again.")
+            sys.exit(1)
+        print("Warning: pandoc is not installed; files the native engine cannot convert will fail.")
     
     # Convert a single file if specified
     if args.single_file:
-        epub_path = convert_md_to_epub(args.single_file, args.output_dir, args.title)
+        epub_path = convert_md_to_epub(args.single_file, args.output_dir, args.title, args.force, args.engine)
         if epub_path:
             print(f"Conversion complete: {epub_path}")
             sys.exit(0)
@@ -290,7 +630,7 @@ def main():
             sys.exit(1)
     
     # Otherwise, scan directory and convert all markdown files
-    success_count = scan_and_convert(args.input_dir, args.output_dir, args.recursive)
+    success_count = scan_and_convert(args.input_dir, args.output_dir, args.recursive, args.jobs, args.force, args.engine)
     
     print(f"\nConversion complete. Successfully converted {success_count} files.")
     
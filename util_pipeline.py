@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Minibook Pipeline
+
+This script runs the whole production of a minibook in one process:
+compose (outline and chapters) -> audio (TTS preprocessing and synthesis per chapter) -> EPUB.
+
+Instead of running minibook_composer.py, util_tts.py and util_md_to_epub_converter.py one
+after the other, each chapter is handed to the audio stage as soon as it has been written,
+and the EPUB is built as soon as the chapters are merged, while audio is still being
+synthesized. The total time is therefore close to the slowest stage rather than the sum of
+all stages.
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import minibook_composer as composer
+
+TTS_WORKERS = 4  # Number of chapters synthesized in parallel
+
+
+def read_chapter_content(chapter):
+    """Return the text of a chapter, reading streamed chapters back from their file (None if unreadable)."""
+    content = chapter.get("content")
+    if content is None:
+        try:
+            with open(chapter["file"], 'r', encoding='utf-8') as f:
+                content = f.read()
+        except OSError:
+            return None
+    return content
+
+
+def synthesize_chapter(index, chapter, project_path, content):
+    """Run the TTS stage for one chapter and return the path of the audio file."""
+    # Imported here so the compose and EPUB stages work without the TTS dependencies
+    import util_tts
+
+    base_name = os.path.splitext(os.path.basename(chapter["file"]))[0]
+    output_file = f"{base_name}.{util_tts.DEFAULT_AUDIO_ENCODING.lower()}"
+    print(f"Synthesizing audio for Chapter {index+1}: {chapter['title']}")
+    return util_tts.synthesize_text_to_folder(
+        text=content,
+        filename=output_file,
+        folder_name=os.path.basename(project_path),
+        preprocess_md=util_tts.DEFAULT_PREPROCESS_MARKDOWN,
+        exclude_tables=util_tts.DEFAULT_EXCLUDE_TABLES,
+        save_text=util_tts.DEFAULT_SAVE_TEXT,
+        folder_base_path=project_path
+    )
+
+
+def build_epub(book_path, output_dir):
+    """Run the EPUB stage for the merged book."""
+    from util_md_to_epub_converter import check_pandoc_installed, convert_md_to_epub
+
+    if not check_pandoc_installed():
+        print("Skipping EPUB: pandoc is not installed or not in the system PATH.")
+        return None
+    return convert_md_to_epub(book_path, output_dir)
+
+
+def run_pipeline(topic, api_llm_key, num_chapters=composer.NUM_CHAPTERS, output_folder=composer.OUTPUT_FOLDER,
+                 outline_instructions=None, chapter_instructions=None, base_chapters=composer.BASE_CHAPTER_COUNT,
+                 narrative_style=None, pedagogical_approach=None, max_concurrency=composer.MAX_CONCURRENCY,
+                 audio=True, epub=True, tts_workers=TTS_WORKERS):
+    """
+    Create a minibook and its EPUB and audio versions with overlapping stages.
+
+    Returns:
+        dict: Paths of the book, EPUB and audio files, and the duration of each stage
+    """
+    start = time.time()
+    timings = {}
+    audio_futures = {}
+    audio_files = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, tts_workers)) as tts_executor, \
+         ThreadPoolExecutor(max_workers=1) as epub_executor:
+
+        def on_chapter(index, chapter):
+            # Hand the chapter to the audio stage while the other chapters are still being written
+            if not audio:
+                return
+            content = read_chapter_content(chapter)
+            if content is None or composer.is_failed_chapter(content):
+                print(f"Skipping audio for Chapter {index+1}: chapter was not generated")
+                return
+            try:
+                # Audio and text folders live next to the chapters folder of the project
+                project_path = os.path.dirname(os.path.dirname(chapter["file"]))
+                os.makedirs(os.path.join(project_path, "audio"), exist_ok=True)
+                os.makedirs(os.path.join(project_path, "text"), exist_ok=True)
+                audio_futures[tts_executor.submit(synthesize_chapter, index, chapter, project_path, content)] = index
+            except Exception as e:
+                # A chapter that cannot be queued for audio must not stop the rest of the book
+                print(f"Could not start audio for Chapter {index+1}: {str(e)}")
+
+        project_path, book_path = composer.create_minibook(
+            topic, api_llm_key, num_chapters, composer.CHAPTER_DELAY, output_folder, True,
+            outline_instructions, chapter_instructions, base_chapters,
+            narrative_style, pedagogical_approach, max_concurrency,
+            on_chapter=on_chapter
+        )
+        timings["compose"] = round(time.time() - start, 1)
+
+        # The merged book is ready: build the EPUB alongside the remaining audio jobs
+        epub_future = None
+        if epub:
+            epub_future = epub_executor.submit(build_epub, book_path, project_path)
+
+        for future in as_completed(list(audio_futures)):
+            index = audio_futures[future]
+            try:
+                audio_files[index] = future.result()
+                print(f"Audio for Chapter {index+1} done: {audio_files[index]}")
+            except Exception as e:
+                print(f"Audio for Chapter {index+1} failed: {str(e)}")
+                audio_files[index] = None
+        if audio_futures:
+            timings["audio"] = round(time.time() - start, 1)
+
+        epub_path = None
+        if epub_future is not None:
+            epub_path = epub_future.result()
+            timings["epub"] = round(time.time() - start, 1)
+
+    timings["total"] = round(time.time() - start, 1)
+    print("\nPipeline complete!")
+    print(f"Book: {book_path}")
+    if epub_path:
+        print(f"EPUB: {epub_path}")
+    if audio_files:
+        done = sum(1 for path in audio_files.values() if path)
+        print(f"Audio: {done}/{len(audio_files)} chapters")
+    print("Stage completion times (seconds since start): " +
+          ", ".join(f"{stage}: {seconds}" for stage, seconds in timings.items()))
+
+    return {
+        "project_path": project_path,
+        "book_path": book_path,
+        "epub_path": epub_path,
+        "audio_files": [audio_files[i] for i in sorted(audio_files)],
+        "timings": timings
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create a minibook with its EPUB and audio versions in one pipelined run.')
+    parser.add_argument('--topic', type=str, default=composer.TOPIC,
+                        help=f'The topic for the minibook (default: "{composer.TOPIC}")')
+    parser.add_argument('--api-key', type=str, default=composer.API_LLM_KEY,
+                        help='Google API key for the LLM (or set GOOGLE_API_KEY environment variable)')
+    parser.add_argument('--num-chapters', default=composer.NUM_CHAPTERS,
+                        help=f'The suggested number of chapters (default: {composer.NUM_CHAPTERS})')
+    parser.add_argument('--output-folder', type=str, default=composer.OUTPUT_FOLDER,
+                        help=f'Folder to store final markdown files (default: {composer.OUTPUT_FOLDER})')
+    parser.add_argument('--narrative-style', type=str, default=composer.NARRATIVE_STYLE,
+                        choices=list(composer.get_available_styles().keys()),
+                        help='Narrative style to use throughout the book')
+    parser.add_argument('--pedagogical-approach', type=str, default=composer.PEDAGOGICAL_APPROACH,
+                        choices=list(composer.get_available_approaches().keys()),
+                        help='Pedagogical approach to structure the content')
+    parser.add_argument('--max-concurrency', type=int, default=composer.MAX_CONCURRENCY,
+                        help=f'Number of chapters to elaborate in parallel (default: {composer.MAX_CONCURRENCY})')
+    parser.add_argument('--tts-workers', type=int, default=TTS_WORKERS,
+                        help=f'Number of chapters to synthesize in parallel (default: {TTS_WORKERS})')
+    parser.add_argument('--no-audio', action='store_true',
+                        help='Skip the audio stage')
+    parser.add_argument('--no-epub', action='store_true',
+                        help='Skip the EPUB stage')
+    parser.add_argument('--debug', action='store_true',
+                        help='Enable debug logging for detailed information')
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO,
+                        format="%(levelname)s: %(message)s")
+
+    try:
+        run_pipeline(
+            args.topic, args.api_key, args.num_chapters, args.output_folder,
+            composer.SELECTED_OUTLINE_INSTRUCTIONS, composer.SELECTED_CHAPTER_INSTRUCTIONS,
+            composer.BASE_CHAPTER_COUNT, args.narrative_style, args.pedagogical_approach,
+            args.max_concurrency, not args.no_audio, not args.no_epub, args.tts_workers
+        )
+    except Exception as e:
+        print(f"Pipeline failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
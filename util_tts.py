@@ -8,12 +8,24 @@ import base64
 import logging
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
 import time
 import json
+import hashlib
+import io
+import wave
+import threading
+import shutil
+import subprocess
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from google.cloud import texttospeech
 from google.cloud import storage
+from google.api_core import operation as api_operation
 from config import API_TTS_KEY, OUTPUT_FOLDER, PROJECT_FOLDER, GCP_PROJECT_ID, GCP_BUCKET_NAME
+from lib_audio_cache import get_audio_cache, DEFAULT_CACHE_FOLDER as DEFAULT_TTS_CACHE_FOLDER
 
 # --- User Configurable Defaults (for IDE runs or no-arg calls) ---
 
@@ -29,13 +41,30 @@ Consider some common hurdles in science education:
 # Google TTS API limits
 STANDARD_TTS_CHAR_LIMIT = 5000  # Character limit for standard TTS API
 LONG_TTS_CHAR_LIMIT = 100000  # Character limit for Long Audio API
+TTS_CHUNK_WORKERS = 4  # Chunks of a long text synthesized in parallel with the standard API
+TTS_API_URL = "https://texttospeech.googleapis.com/v1/text:synthesize"  # Standard (REST) synthesis endpoint
+TTS_CONNECT_TIMEOUT = 10  # Seconds to wait for a connection to the TTS API
+TTS_READ_TIMEOUT = 120  # Seconds to wait for the audio of a single request
+TTS_MAX_RETRIES = 3  # Retries with exponential backoff on 429 and 5xx responses
+TTS_POOL_SIZE = 10  # Keep-alive connections kept open to the TTS API
+USE_TTS_CACHE = True  # Reuse audio of text segments synthesized before with the same voice settings
+TTS_CACHE_FOLDER = DEFAULT_TTS_CACHE_FOLDER  # Where cached audio segments are stored
+TTS_CACHE_MAX_MB = 500  # Least recently used segments are evicted above this size
 USE_LONG_AUDIO_API = True  # Set to False to only use standard API
-SKIP_EXISTING_AUDIO_FILES = True  # Set to False to reprocess files even if they already exist
+SKIP_EXISTING_AUDIO_FILES = True  # Skip files whose text and voice settings are unchanged since their audio was made
+AUDIO_MANIFEST_FILE = "audio_manifest.json"  # Per audio folder record of what each audio file was made from
+FAILED_AUDIO_FINGERPRINT = "failed"  # Manifest fingerprint of error placeholders, so they are retried
 LONG_AUDIO_TIMEOUT_SECONDS = 360  # Timeout in seconds for Long Audio API operations (5 minutes)
+LONG_AUDIO_POLL_SECONDS = 10  # How often running Long Audio operations are checked in folder mode
+LONG_AUDIO_MAX_JOBS = 10  # Long Audio operations kept running at once in folder mode (bounded by the API quota)
+LONG_AUDIO_JOURNAL_FILE = "long_audio_jobs.json"  # Per audio folder record of running Long Audio operations
+FOLDER_WORKERS = 4  # Chapters synthesized in parallel in folder mode (1 = one after the other)
 USE_SSML = True  # Use Speech Synthesis Markup Language for better speech control
 FORCE_PLAIN_TEXT = True  # Force plain text mode even for SSML-compatible voices (until SSML issues are fixed)
 SSML_RULES_FILE = "ssml_rules.json"  # File containing SSML transformation rules
+VALIDATE_SSML = False  # Parse the generated SSML as XML before sending it (it is well-formed by construction)
 MARKDOWN_RULES_FILE = "markdown_rules.json"  # File containing markdown preprocessing rules
+MARKDOWN_ENGINE = "regex"  # "regex" applies MARKDOWN_RULES_FILE, "fast" uses the built-in single-pass converter
 DISABLE_SSL_VERIFICATION = False  # Set to True to disable SSL verification for testing
 LONG_AUDIO_ENCODING = "LINEAR16"  # Only LINEAR16 is supported for Long Audio API
 
@@ -50,6 +79,7 @@ SSML_COMPATIBLE_VOICES = [
 #WAV to MP3
 AUTO_CONVERT_WAV_TO_MP3 = True  # Whether to automatically convert WAV files to MP3 when using Long Audio API
 MP3_BITRATE = "64k"  # Default bitrate for MP3 conversion
+AUDIO_STREAM_BLOCK_SIZE = 1024 * 1024  # Bytes piped to ffmpeg at a time when streaming WAV to MP3
 AUDIO_SAMPLE_RATE = 22050  # Default audio sample rate in Hz (22050 is sufficient for speech)
 AUDIO_BIT_DEPTH = 16  # Default bit depth (16-bit is standard for most audio)
 AUDIO_CHANNELS = 1  # Default number of channels (1=mono, 2=stereo)
@@ -95,70 +125,36 @@ def apply_ssml_rules(text):
     if not USE_SSML:
         return text
     
-    # Create a simplified and safe version of the text for SSML
-    # First, escape XML special characters
-    ssml_text = text.replace("&", "&amp;")
-    ssml_text = ssml_text.replace("<", "&lt;")
-    ssml_text = ssml_text.replace(">", "&gt;")
-    ssml_text = ssml_text.replace("\"", "&quot;")
-    ssml_text = ssml_text.replace("'", "&apos;")
-    
-    # Load custom rules from file if it exists
-    rules = []
+    # Load the compiled rules (cached until the rules file changes)
+    builder = None
     try:
         if os.path.exists(SSML_RULES_FILE):
-            with open(SSML_RULES_FILE, 'r') as f:
-                rules = json.load(f)
-                logging.info(f"Loaded {len(rules)} SSML rules from {SSML_RULES_FILE}")
+            builder = get_ssml_builder(SSML_RULES_FILE)
         else:
             logging.warning(f"SSML rules file {SSML_RULES_FILE} not found, using default rules")
     except Exception as e:
         logging.error(f"Error loading SSML rules: {e}")
+    if builder is None:
+        builder = SSMLBuilder(RuleSet([], source="default"))
     
-    # Apply built-in rules and rules from file
-    for rule in rules:
-        try:
-            # Skip disabled rules
-            if rule.get("enabled") is False:
-                logging.debug(f"Skipping disabled rule: {rule.get('description')}")
-                continue
-            
-            # Apply rule based on type
-            if rule.get("type") == "replace":
-                pattern = rule.get("pattern")
-                replacement = rule.get("replacement")
-                if pattern and replacement:
-                    ssml_text = ssml_text.replace(pattern, replacement)
-                    logging.debug(f"Applied replace rule: {rule.get('description')}")
-            elif rule.get("type") == "regex":
-                pattern = rule.get("pattern")
-                replacement = rule.get("replacement")
-                if pattern and replacement:
-                    try:
-                        ssml_text = re.sub(pattern, replacement, ssml_text)
-                        logging.debug(f"Applied regex rule: {rule.get('description')}")
-                    except Exception as regex_error:
-                        logging.error(f"Regex error applying rule {rule.get('description')}: {regex_error}")
-        except Exception as e:
-            logging.error(f"Error applying SSML rule {rule.get('description')}: {e}")
-    
-    # Finally, wrap the entire text in <speak> tags
-    ssml_text = f"<speak>{ssml_text}</speak>"
+    # Escape the text, insert the rule markup and wrap it in <speak> tags in one pass
+    ssml_text = builder.build(text)
     
     # Log the full SSML for debugging when in debug mode
     if logging.getLogger().getEffectiveLevel() <= logging.DEBUG:
         logging.debug(f"Full SSML:\n{ssml_text}")
     
-    # Validate SSML
-    try:
-        import xml.etree.ElementTree as ET
-        ET.fromstring(ssml_text)
-        logging.debug("SSML validation passed")
-    except Exception as xml_error:
-        logging.error(f"Invalid SSML generated! XML parsing error: {xml_error}")
-        # If SSML is invalid, fall back to plain text
-        logging.warning("Falling back to plain text due to invalid SSML")
-        return text
+    # The builder only emits well-formed SSML, so parsing it is only done on request
+    if VALIDATE_SSML:
+        try:
+            import xml.etree.ElementTree as ET
+            ET.fromstring(ssml_text)
+            logging.debug("SSML validation passed")
+        except Exception as xml_error:
+            logging.error(f"Invalid SSML generated! XML parsing error: {xml_error}")
+            # If SSML is invalid, fall back to plain text
+            logging.warning("Falling back to plain text due to invalid SSML")
+            return text
     
     # Log the length of the SSML 
     logging.info(f"Generated SSML of length {len(ssml_text)} characters")
@@ -209,6 +205,9 @@ def preprocess_markdown(text, exclude_tables=DEFAULT_EXCLUDE_TABLES):
         text: The markdown text to process
         exclude_tables: Whether to exclude tables from the output
     """
+    if MARKDOWN_ENGINE == "fast":
+        return markdown_to_speech(text, exclude_tables=exclude_tables)
+    
     # Try to load and apply rules from markdown_rules.json
     try:
         if os.path.exists(MARKDOWN_RULES_FILE):
@@ -274,80 +273,692 @@ def preprocess_markdown_hardcoded(text, exclude_tables=DEFAULT_EXCLUDE_TABLES):
     
     return text
 
+def parse_regex_flags(flags_str):
+    """Convert a flags string from a rules file (e.g. "MULTILINE|DOTALL") into re flags."""
+    flag_names = {
+        "IGNORECASE": re.IGNORECASE, "I": re.IGNORECASE,
+        "MULTILINE": re.MULTILINE, "M": re.MULTILINE,
+        "DOTALL": re.DOTALL, "S": re.DOTALL,
+    }
+    flags = 0
+    for name in re.split(r'[|,\s]+', flags_str or ""):
+        flags |= flag_names.get(name.upper(), 0)
+    return flags
+
+def translate_replacement(replacement, group_count):
+    """
+    Translate a "$1"-style replacement from a rules file into a native re template ("\\g<1>").
+    Backslashes are escaped so they stay literal, and "$n" beyond the pattern's groups is kept as is.
+    """
+    template = replacement.replace("\\", "\\\\")
+    return re.sub(
+        r'\$(\d+)',
+        lambda m: f"\\g<{m.group(1)}>" if 0 < int(m.group(1)) <= group_count else m.group(0),
+        template
+    )
+
+class RuleSet:
+    """
+    A compiled set of text transformation rules, as loaded from markdown_rules.json or ssml_rules.json.
+    
+    Rules are validated and compiled once; apply() then runs them over a text without any
+    further parsing, so one RuleSet can be reused for every file in a folder.
+    """
+    
+    def __init__(self, rules, source="rules"):
+        self.source = source
+        self.rules = []
+        for rule in rules:
+            description = rule.get("description", "")
+            # Skip disabled rules
+            if rule.get("enabled") is False:
+                logging.debug(f"Skipping disabled rule: {description}")
+                continue
+            
+            pattern = rule.get("pattern")
+            replacement = rule.get("replacement")
+            if not pattern or replacement is None:
+                continue
+            is_table_rule = "table" in description.lower()
+            
+            if rule.get("type") == "regex":
+                try:
+                    compiled = re.compile(pattern, parse_regex_flags(rule.get("flags", "")))
+                    template = translate_replacement(replacement, compiled.groups)
+                    # Validate the template once instead of failing on every match
+                    compiled.sub(template, "")
+                except re.error as regex_error:
+                    logging.error(f"Regex error in rule {description}: {regex_error}")
+                    continue
+                self.rules.append(("regex", compiled, template, description, is_table_rule))
+            elif rule.get("type") == "replace":
+                self.rules.append(("replace", pattern, replacement, description, is_table_rule))
+    
+    @classmethod
+    def from_file(cls, path):
+        """Load and compile a rules file."""
+        with open(path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        logging.info(f"Loaded {len(rules)} rules from {path}")
+        return cls(rules, source=path)
+    
+    def apply(self, text, exclude_tables=True):
+        """Apply all rules to the text. Table rules are skipped when exclude_tables is False."""
+        for kind, pattern, replacement, description, is_table_rule in self.rules:
+            if is_table_rule and not exclude_tables:
+                continue
+            try:
+                if kind == "regex":
+                    text = pattern.sub(replacement, text)
+                else:
+                    text = text.replace(pattern, replacement)
+            except Exception as e:
+                logging.error(f"Error applying rule {description}: {e}")
+        return text
+
+# Compiled rule sets by file path, reloaded when the file changes: path -> (mtime, RuleSet)
+_rule_set_cache = {}
+_rule_set_lock = threading.Lock()
+
+def get_rule_set(path):
+    """Return the compiled RuleSet for a rules file, recompiling it only when its mtime changes."""
+    mtime = os.path.getmtime(path)
+    with _rule_set_lock:
+        cached = _rule_set_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        rule_set = RuleSet.from_file(path)
+        _rule_set_cache[path] = (mtime, rule_set)
+        return rule_set
+
+XML_ESCAPES = {"&": "&amp;", "<": "&lt;", ">": "&gt;", "\"": "&quot;", "'": "&apos;"}
+XML_SPECIAL_CHARS = re.compile(r'[&<>"\']')
+TEMPLATE_TOKEN = re.compile(r'\\\\|\\g<(\d+)>')
+
+def escape_xml(text):
+    """Escape the XML special characters of a text in one scan."""
+    return XML_SPECIAL_CHARS.sub(lambda m: XML_ESCAPES[m.group()], text)
+
+class SSMLBuilder:
+    """
+    Converts plain text to SSML using a compiled RuleSet of ssml_rules.json.
+    
+    The rules and the XML escaping are combined into a single pattern, so the text is scanned
+    once; at each position the first matching rule wins. Every replacement is checked to be a
+    well-formed fragment when the builder is created and captured text is escaped, which makes
+    the generated document well-formed by construction.
+    """
+    
+    def __init__(self, rule_set):
+        parts = []
+        self.outputs = {}  # group name -> (index of the rule's group, replacement pieces)
+        self.constants = {}  # group name -> fixed output of rules without groups
+        first_chars = set(XML_ESCAPES)  # Characters a match can start with, None if unknown
+        group_offset = 0
+        for index, (kind, pattern, replacement, description, _) in enumerate(rule_set.rules):
+            name = f"rule{index}"
+            if kind == "regex":
+                if pattern.groupindex or re.search(r'\\[1-9]|\(\?P=', pattern.pattern):
+                    logging.error(f"SSML rule {description} uses named groups or backreferences and was skipped")
+                    continue
+                flags = "".join(letter for flag, letter in ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"))
+                                if pattern.flags & flag)
+                source = f"(?{flags}:{pattern.pattern})" if flags else pattern.pattern
+                groups = pattern.groups
+                pieces = self._template_pieces(replacement)
+                first = self._first_char(pattern.pattern)
+                if first is not None and pattern.flags & re.IGNORECASE:
+                    first = first.lower() + first.upper()
+            else:
+                source = re.escape(pattern)
+                groups = 0
+                pieces = [replacement]
+                first = pattern[0]
+            try:
+                re.compile(f"(?P<{name}>{source})")
+            except re.error as regex_error:
+                logging.error(f"SSML rule {description} cannot be combined with the other rules: {regex_error}")
+                continue
+            if not self._is_well_formed(pieces):
+                logging.error(f"SSML rule {description} does not produce well-formed SSML and was skipped")
+                continue
+            parts.append(f"(?P<{name}>{source})")
+            self.outputs[name] = (group_offset + 1, pieces)
+            if all(isinstance(piece, str) for piece in pieces):
+                self.constants[name] = "".join(pieces)
+            if first is None or first_chars is None:
+                first_chars = None
+            else:
+                first_chars.update(first)
+            group_offset += 1 + groups
+        parts.append(r'(?P<xml>[&<>"\'])')
+        combined = "|".join(parts)
+        if first_chars is not None:
+            # Let the regex engine skip plain text quickly instead of trying every rule at each position
+            combined = f"(?=[{''.join(re.escape(char) for char in sorted(first_chars))}])(?:{combined})"
+        self.pattern = re.compile(combined)
+    
+    @staticmethod
+    def _first_char(pattern):
+        """Return the literal character a regex must start with, or None if it cannot be told."""
+        if not pattern or SSMLBuilder._has_top_level_alternation(pattern):
+            return None
+        if pattern[0] == "\\" and len(pattern) > 1:
+            escaped = pattern[1]
+            if escaped in "nrtfv":
+                first = {"n": "\n", "r": "\r", "t": "\t", "f": "\f", "v": "\v"}[escaped]
+            elif escaped.isalnum():
+                return None
+            else:
+                first = escaped
+            rest = pattern[2:]
+        elif pattern[0] in ".^$*+?{}[]()|":
+            return None
+        else:
+            first = pattern[0]
+            rest = pattern[1:]
+        # A quantifier that allows zero repetitions makes the first atom optional
+        if rest[:1] in ("?", "*") or rest.startswith(("{0", "{,")):
+            return None
+        return first
+    
+    @staticmethod
+    def _has_top_level_alternation(pattern):
+        """Check whether a regex has a | outside of groups and character classes."""
+        depth = 0
+        in_class = False
+        position = 0
+        while position < len(pattern):
+            char = pattern[position]
+            if char == "\\":
+                position += 2
+                continue
+            if in_class:
+                if char == "]":
+                    in_class = False
+            elif char == "[":
+                in_class = True
+                # A ] right after [ or [^ is a literal, not the end of the class
+                if pattern[position + 1:position + 2] == "^":
+                    position += 1
+                if pattern[position + 1:position + 2] == "]":
+                    position += 1
+            elif char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif char == "|" and depth == 0:
+                return True
+            position += 1
+        return False
+    
+    @staticmethod
+    def _template_pieces(template):
+        """Split a compiled replacement template into literal markup and group numbers."""
+        pieces = []
+        literal = ""
+        position = 0
+        for token in TEMPLATE_TOKEN.finditer(template):
+            literal += template[position:token.start()]
+            if token.group(1):
+                if literal:
+                    pieces.append(literal)
+                literal = ""
+                pieces.append(int(token.group(1)))
+            else:
+                literal += "\\"
+            position = token.end()
+        literal += template[position:]
+        if literal:
+            pieces.append(literal)
+        return pieces
+    
+    @staticmethod
+    def _is_well_formed(pieces):
+        import xml.etree.ElementTree as ET
+        fragment = "".join("x" if isinstance(piece, int) else piece for piece in pieces)
+        try:
+            ET.fromstring(f"<speak>{fragment}</speak>")
+            return True
+        except ET.ParseError:
+            return False
+    
+    def _replace(self, match):
+        name = match.lastgroup
+        if name == "xml":
+            return XML_ESCAPES[match.group()]
+        output = self.constants.get(name)
+        if output is not None:
+            return output
+        group, pieces = self.outputs[name]
+        return "".join(
+            escape_xml(match.group(group + piece) or "") if isinstance(piece, int) else piece
+            for piece in pieces
+        )
+    
+    def build(self, text):
+        """Return the text as an SSML document."""
+        return f"<speak>{self.pattern.sub(self._replace, text)}</speak>"
+
+# SSML builders by rules file path, rebuilt whenever get_rule_set() recompiles the file
+_ssml_builder_cache = {}
+
+def get_ssml_builder(path):
+    """Return the SSMLBuilder for an SSML rules file."""
+    rule_set = get_rule_set(path)
+    with _rule_set_lock:
+        cached = _ssml_builder_cache.get(path)
+        if cached and cached[0] is rule_set:
+            return cached[1]
+        builder = SSMLBuilder(rule_set)
+        _ssml_builder_cache[path] = (rule_set, builder)
+        return builder
+
 def preprocess_markdown_with_rules(text, exclude_tables=DEFAULT_EXCLUDE_TABLES):
     """
     Preprocess markdown text using the rule-based approach from markdown_rules.json.
     """
-    processed_text = text
-    
-    # Load markdown preprocessing rules from file
-    rules = []
     try:
-        with open(MARKDOWN_RULES_FILE, 'r') as f:
-            rules = json.load(f)
-            logging.info(f"Loaded {len(rules)} markdown rules from {MARKDOWN_RULES_FILE}")
+        rule_set = get_rule_set(MARKDOWN_RULES_FILE)
     except Exception as e:
         logging.error(f"Error loading markdown rules: {e}")
         return preprocess_markdown_hardcoded(text, exclude_tables)
     
-    # Apply rules from the configuration file
-    for rule in rules:
-        try:
-            # Skip disabled rules
-            if rule.get("enabled") is False:
-                logging.debug(f"Skipping disabled markdown rule: {rule.get('description')}")
+    return rule_set.apply(text, exclude_tables)
+
+
+# Patterns for the single-pass markdown converter (markdown_to_speech)
+MD_FENCE = re.compile(r'^\s*```')
+MD_TABLE_ROW = re.compile(r'^\|.+\|$')
+MD_HORIZONTAL_RULE = re.compile(r'^\s*[-*_]{3,}\s*$')
+MD_HEADING = re.compile(r'^(\s*)#+\s+')
+MD_BLOCKQUOTE = re.compile(r'^\s*>\s+')
+MD_BULLET = re.compile(r'^(\s*)([-*+])\s+')
+MD_NUMBERED = re.compile(r'^\s*(\d+)\.\s+')
+MD_INLINE = re.compile(r"""
+    (?P<code_mark>`+)(?P<code>.+?)(?P=code_mark)      # inline code
+  | \$\$(?P<display_math>.+?)\$\$                      # display formula on one line
+  | \$(?P<math>[^$\n]+?)\$                            # inline formula
+  | !?\[(?P<link>[^\]\n]*)\]\([^)\n]*\)                # link or image -> its text
+  | \*\*(?P<strong>.+?)\*\*                            # bold
+  | __(?P<strong_underscore>.+?)__                    # bold
+  | \*(?P<emphasis>[^*\n]+?)\*                        # italic
+  | (?<![^\W_])_(?P<emphasis_underscore>[^_\n]+?)_(?![^\W_])  # italic, not inside words
+""", re.VERBOSE)
+TABLE_PLACEHOLDER = "[Table excluded from speech]"
+
+MD_BLOCK_MARKERS = set("`$|#>-*_+0123456789")  # First characters of lines that may start a block construct
+MD_INLINE_MARKERS = set("`$[*_")  # Characters that may start inline markup
+
+def _speak_inline_match(match):
+    kind = match.lastgroup
+    value = match.group(kind)
+    if kind == "code":
+        return value
+    if kind in ("math", "display_math"):
+        return f"[formula: {value}]"
+    # Links and emphasis may contain further inline markup
+    return MD_INLINE.sub(_speak_inline_match, value)
+
+def _speak_inline(text):
+    """Convert inline markdown of a single line to speech text in one scan."""
+    if MD_INLINE_MARKERS.isdisjoint(text):
+        return text
+    return MD_INLINE.sub(_speak_inline_match, text)
+
+def markdown_to_speech(text, exclude_tables=DEFAULT_EXCLUDE_TABLES):
+    """
+    Convert markdown to speech text in a single pass, as a fast alternative to the
+    rule-based engine (selected with --md-engine fast).
+    
+    Each line is classified once at block level (code fences, display formulas, tables,
+    headings, lists, rules, quotes) and its inline markup is then converted with one combined
+    scan, instead of running every rule of markdown_rules.json over the whole text. The output
+    matches the rule-based engine for regular chapters; it additionally keeps formulas and
+    words_with_underscores intact, only strips headings at the start of a line and never
+    joins the line after a table to the table placeholder.
+    """
+    lines = text.split("\n")
+    out = []
+    i = 0
+    count = len(lines)
+    while i < count:
+        line = lines[i]
+        stripped = line.strip()
+        
+        # Plain paragraph lines only need inline conversion
+        if stripped[:1] not in MD_BLOCK_MARKERS:
+            out.append(_speak_inline(line))
+            i += 1
+            continue
+        
+        # Code blocks are not read out
+        if MD_FENCE.match(line):
+            close = next((j for j in range(i + 1, count) if MD_FENCE.match(lines[j])), None)
+            if close is not None:
+                out.append("")
+                i = close + 1
                 continue
-                
-            # Skip table rules if exclude_tables is False
-            if not exclude_tables and ("table" in rule.get("description", "").lower()):
-                logging.debug(f"Skipping table rule because exclude_tables=False: {rule.get('description')}")
+        
+        # Display formulas spanning several lines
+        if stripped.startswith("$$") and stripped.count("$$") == 1:
+            close = next((j for j in range(i + 1, count) if "$$" in lines[j]), None)
+            if close is not None:
+                body = [stripped[2:]] + [l.strip() for l in lines[i + 1:close]] + [lines[close].strip().split("$$")[0]]
+                out.append(f"[formula: {' '.join(part for part in body if part)}]")
+                i = close + 1
                 continue
-                
-            if rule.get("type") == "regex":
-                pattern = rule.get("pattern")
-                replacement = rule.get("replacement")
-                flags_str = rule.get("flags", "")
-                
-                if pattern and replacement is not None:
-                    # Parse regex flags
-                    flags = 0
-                    if "IGNORECASE" in flags_str or "I" in flags_str:
-                        flags |= re.IGNORECASE
-                    if "MULTILINE" in flags_str or "M" in flags_str:
-                        flags |= re.MULTILINE
-                    if "DOTALL" in flags_str or "S" in flags_str:
-                        flags |= re.DOTALL
-                        
-                    try:
-                        # Compile the pattern first to ensure it's valid
-                        compiled_pattern = re.compile(pattern, flags=flags)
-                        # Use a function for replacement to properly handle capture groups
-                        def replace_func(match):
-                            result = replacement
-                            # Handle capture groups ($1, $2, etc.)
-                            for i in range(1, len(match.groups()) + 1):
-                                placeholder = f"${i}"
-                                if placeholder in result:
-                                    result = result.replace(placeholder, match.group(i) or '')
-                            return result
-                        
-                        processed_text = compiled_pattern.sub(replace_func, processed_text)
-                        logging.debug(f"Applied markdown rule: {rule.get('description')}")
-                    except Exception as regex_error:
-                        logging.error(f"Regex error applying markdown rule {rule.get('description')}: {regex_error}")
-            
-            elif rule.get("type") == "replace":
-                pattern = rule.get("pattern")
-                replacement = rule.get("replacement")
-                
-                if pattern and replacement is not None:
-                    processed_text = processed_text.replace(pattern, replacement)
-                    logging.debug(f"Applied markdown replace rule: {rule.get('description')}")
-                    
+        
+        # Tables: two or more consecutive rows of pipes
+        if exclude_tables and MD_TABLE_ROW.match(line) and i + 1 < count and MD_TABLE_ROW.match(lines[i + 1]):
+            end = i + 1
+            while end + 1 < count and MD_TABLE_ROW.match(lines[end + 1]):
+                end += 1
+            out.extend(["", TABLE_PLACEHOLDER, ""])
+            i = end + 1
+            continue
+        
+        if MD_HORIZONTAL_RULE.match(line):
+            out.extend(["", ""])
+            i += 1
+            continue
+        
+        prefix = ""
+        quote = MD_BLOCKQUOTE.match(line)
+        if quote:
+            line = line[quote.end():]
+        joins_previous = bool(quote)
+        heading = MD_HEADING.match(line)
+        if heading:
+            line = heading.group(1) + line[heading.end():]
+        # Headings are checked for list markers too, e.g. "### 1. Title" reads as a numbered item
+        bullet = MD_BULLET.match(line)
+        numbered = None if bullet else MD_NUMBERED.match(line)
+        if bullet:
+            rest = line[bullet.end():]
+            # Bullets that open with bold text keep their indentation and paragraph break
+            keeps_layout = bullet.group(2) == "*" and rest.startswith("**")
+            prefix, line = (bullet.group(1) if keeps_layout else "") + "• ", rest
+            joins_previous = not keeps_layout
+        elif numbered:
+            prefix, line = f"{numbered.group(1)}. ", line[numbered.end():]
+            joins_previous = True
+        
+        # Lists and quotes follow the preceding text without a paragraph break
+        if joins_previous:
+            while out and not out[-1].strip():
+                out.pop()
+        out.append(prefix + _speak_inline(line))
+        i += 1
+    
+    # Collapse runs of blank lines into a single paragraph break
+    result = []
+    last = len(out) - 1
+    previous_blank = False
+    for index, line in enumerate(out):
+        if 0 < index < last and not line.strip():
+            if not previous_blank:
+                result.append("")
+            previous_blank = True
+            continue
+        previous_blank = False
+        result.append(line)
+    return "\n".join(result)
+
+
+def transcode_wav_stream_to_mp3(source, mp3_path):
+    """
+    Encode a WAV stream (an open file or GCS blob reader) to MP3 with an ffmpeg subprocess,
+    applying AUDIO_SAMPLE_RATE, AUDIO_CHANNELS and MP3_BITRATE. The stream is piped in blocks
+    of AUDIO_STREAM_BLOCK_SIZE bytes, so memory use does not grow with the length of the audio.
+    Raises RuntimeError if ffmpeg fails.
+    """
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "wav", "-i", "pipe:0",
+        "-ar", str(AUDIO_SAMPLE_RATE),
+        "-ac", str(AUDIO_CHANNELS),
+        "-codec:a", "libmp3lame",
+        "-b:a", MP3_BITRATE,
+        mp3_path,
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        while True:
+            block = source.read(AUDIO_STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            process.stdin.write(block)
+        process.stdin.close()
+    except BrokenPipeError:
+        # ffmpeg stopped reading; its error message is reported below
+        pass
+    except Exception:
+        process.kill()
+        process.wait()
+        raise
+    error_output = process.stderr.read().decode("utf-8", errors="replace").strip()
+    if process.wait() != 0:
+        if os.path.exists(mp3_path):
+            os.remove(mp3_path)
+        raise RuntimeError(f"ffmpeg failed with exit code {process.returncode}: {error_output}")
+    
+    logging.info(f"Converted WAV to MP3: {mp3_path} (bitrate: {MP3_BITRATE}, "
+                 f"sample rate: {AUDIO_SAMPLE_RATE} Hz, channels: {AUDIO_CHANNELS})")
+    return mp3_path
+
+
+def convert_wav_to_mp3(wav_path, mp3_path):
+    """
+    Convert a WAV file to MP3 using the configured audio parameters and remove the WAV file.
+    The file is streamed through ffmpeg if it is on the PATH, otherwise it is converted in
+    memory with pydub.
+    Returns the MP3 path, or None if the conversion failed (the WAV file is then kept).
+    """
+    if shutil.which("ffmpeg"):
+        try:
+            with open(wav_path, "rb") as source:
+                transcode_wav_stream_to_mp3(source, mp3_path)
+            os.remove(wav_path)
+            return mp3_path
         except Exception as e:
-            logging.error(f"Error applying markdown rule {rule.get('description')}: {e}")
+            logging.error(f"Failed to convert WAV to MP3: {e}")
+            logging.info("Keeping WAV format")
+            return None
     
-    return processed_text
+    try:
+        from pydub import AudioSegment
+        
+        # Load the WAV file
+        audio = AudioSegment.from_wav(wav_path)
+        
+        # Apply audio parameters
+        audio = audio.set_frame_rate(AUDIO_SAMPLE_RATE)
+        audio = audio.set_sample_width(AUDIO_BIT_DEPTH // 8)  # Convert bits to bytes
+        audio = audio.set_channels(AUDIO_CHANNELS)
+        
+        # Export with the specified parameters
+        audio.export(
+            mp3_path, 
+            format="mp3", 
+            bitrate=MP3_BITRATE,
+            parameters=["-q:a", "0"]  # Use highest quality encoding
+        )
+        
+        logging.info(f"Converted WAV to MP3: {mp3_path} (bitrate: {MP3_BITRATE}, "
+                     f"sample rate: {AUDIO_SAMPLE_RATE} Hz, bit depth: {AUDIO_BIT_DEPTH}-bit, "
+                     f"channels: {AUDIO_CHANNELS})")
+        
+        # Remove the WAV file to save space
+        os.remove(wav_path)
+        return mp3_path
+    except Exception as e:
+        logging.error(f"Failed to convert WAV to MP3: {e}")
+        logging.info("Keeping WAV format")
+        return None
+
+
+_long_audio_client = None
+_storage_client = None
+_gcp_clients_lock = threading.Lock()
+
+def get_long_audio_client():
+    """Return the Long Audio API client shared by all operations, creating it on first use."""
+    global _long_audio_client
+    with _gcp_clients_lock:
+        if _long_audio_client is None:
+            try:
+                _long_audio_client = texttospeech.TextToSpeechLongAudioSynthesizeClient()
+                logging.info("Created TextToSpeechLongAudioSynthesizeClient successfully")
+            except Exception as e:
+                logging.error(f"Error creating TextToSpeechLongAudioSynthesizeClient: {e}")
+                # Try alternative client creation
+                from google.cloud.texttospeech import TextToSpeechClient
+                _long_audio_client = TextToSpeechClient()
+                logging.info("Falling back to standard TextToSpeechClient")
+        return _long_audio_client
+
+def get_storage_client():
+    """Return the Cloud Storage client shared by all downloads, creating it on first use."""
+    global _storage_client
+    with _gcp_clients_lock:
+        if _storage_client is None:
+            _storage_client = storage.Client()
+        return _storage_client
+
+
+def start_long_audio_synthesis(
+    text: str,
+    output_filename: str,
+    output_dir: str,
+    language_code: str = DEFAULT_LANGUAGE_CODE,
+    voice_name: str = DEFAULT_VOICE_NAME,
+    speaking_rate: float = DEFAULT_SPEAKING_RATE,
+    pitch: float = DEFAULT_PITCH,
+    audio_encoding: str = DEFAULT_AUDIO_ENCODING,  # This is ignored for Long Audio API
+) -> dict:
+    """
+    Start a Long Audio API operation without waiting for it.
+    Returns a job dictionary to pass to finish_long_audio_synthesis().
+    
+    Note: Requires GCP credentials setup and permissions to:
+    - texttospeech.longAudioSynthesize API
+    - Cloud Storage bucket access
+    
+    Note: Long Audio API only supports LINEAR16 format, regardless of audio_encoding parameter
+    """
+    # Print environment info for debugging
+    logging.info(f"GCP_PROJECT_ID: {GCP_PROJECT_ID}")
+    logging.info(f"GCP_BUCKET_NAME: {GCP_BUCKET_NAME}")
+    
+    if DISABLE_SSL_VERIFICATION:
+        os.environ['GRPC_SSL_CIPHER_SUITES'] = 'HIGH+ECDSA'
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    
+    client = get_long_audio_client()
+    
+    # Configure the voice request
+    voice = texttospeech.VoiceSelectionParams(
+        language_code=language_code,
+        name=voice_name
+    )
+    
+    # Long Audio API only supports LINEAR16 encoding
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+        speaking_rate=speaking_rate,
+        pitch=pitch,
+    )
+    
+    # Adjust output filename to have .wav extension since we use LINEAR16
+    output_filename_base = os.path.splitext(output_filename)[0]
+    output_filename_wav = f"{output_filename_base}.wav"
+    
+    # Create unique output path in GCS bucket (milliseconds, as many operations may start each second)
+    timestamp = int(time.time() * 1000)
+    gcs_output_path = f"gs://{GCP_BUCKET_NAME}/tts_output_{timestamp}/{output_filename_wav}"
+    logging.info(f"Long Audio API output path: {gcs_output_path}")
+    
+    # Set the input based on whether text contains SSML tags
+    is_ssml = text.startswith("<speak>") and text.endswith("</speak>")
+    if is_ssml:
+        input_text = texttospeech.SynthesisInput(ssml=text)
+        logging.info("Using SSML input for Long Audio API")
+    else:
+        input_text = texttospeech.SynthesisInput(text=text)
+        logging.info("Using plain text input for Long Audio API")
+    
+    # Create the request
+    parent = f"projects/{GCP_PROJECT_ID}/locations/global"
+    
+    # Call the Long Audio API using the proper request format
+    request = texttospeech.SynthesizeLongAudioRequest(
+        parent=parent,
+        input=input_text,
+        voice=voice,
+        audio_config=audio_config,
+        output_gcs_uri=gcs_output_path
+    )
+    
+    logging.info("Starting Long Audio synthesis with proper request format")
+    operation = client.synthesize_long_audio(request=request)
+    
+    logging.info("Long Audio synthesis started, this may take several minutes...")
+    
+    return {
+        "operation": operation,
+        "operation_name": getattr(getattr(operation, "operation", None), "name", None),
+        "gcs_output_path": gcs_output_path,
+        "output_dir": output_dir,
+        "output_filename": output_filename,
+        "output_filename_wav": output_filename_wav,
+        "audio_encoding": audio_encoding,
+        "started_at": time.time(),
+    }
+
+
+def finish_long_audio_synthesis(job: dict, timeout: float = None) -> str:
+    """
+    Wait for a Long Audio operation started with start_long_audio_synthesis(), download the
+    result from GCS and convert it to MP3 if requested.
+    Returns the path to the downloaded audio file.
+    """
+    # Wait for the operation to complete
+    response = job["operation"].result(timeout=timeout or LONG_AUDIO_TIMEOUT_SECONDS)  # Using the configurable timeout
+    logging.info(f"Long Audio synthesis complete: {response}")
+    
+    # Download the result from GCS
+    bucket = get_storage_client().bucket(GCP_BUCKET_NAME)
+    # Extract the object name from gcs_output_path (remove 'gs://bucket_name/' part)
+    object_name = job["gcs_output_path"].replace(f"gs://{GCP_BUCKET_NAME}/", "")
+    blob = bucket.blob(object_name)
+    
+    # If MP3 was requested, stream the WAV from GCS straight into ffmpeg without a local copy
+    want_mp3 = job["audio_encoding"].upper() == "MP3" and AUTO_CONVERT_WAV_TO_MP3
+    if want_mp3 and shutil.which("ffmpeg"):
+        mp3_path = os.path.join(job["output_dir"], job["output_filename"])
+        try:
+            with blob.open("rb", chunk_size=AUDIO_STREAM_BLOCK_SIZE) as source:
+                return transcode_wav_stream_to_mp3(source, mp3_path)
+        except Exception as e:
+            logging.error(f"Failed to stream WAV to MP3: {e}")
+            logging.info("Downloading the WAV file instead")
+    
+    # Create local output path
+    local_output_path = os.path.join(job["output_dir"], job["output_filename_wav"])
+    
+    # Download the file to the specified path
+    blob.download_to_filename(local_output_path)
+    logging.info(f"Audio downloaded to: {local_output_path}")
+    
+    # If original request was for MP3, convert the WAV to MP3
+    if want_mp3:
+        mp3_path = convert_wav_to_mp3(local_output_path, os.path.join(job["output_dir"], job["output_filename"]))
+        if mp3_path:
+            return mp3_path
+    
+    return local_output_path
 
 
 def synthesize_with_long_audio_api(
@@ -370,168 +981,464 @@ def synthesize_with_long_audio_api(
     
     Note: Long Audio API only supports LINEAR16 format, regardless of audio_encoding parameter
     """
-    # Import os at the function level to avoid scope issues
-    import os
-    
     try:
-        # Print environment info for debugging
-        logging.info(f"GCP_PROJECT_ID: {GCP_PROJECT_ID}")
-        logging.info(f"GCP_BUCKET_NAME: {GCP_BUCKET_NAME}")
-        
-        if DISABLE_SSL_VERIFICATION:
-            os.environ['GRPC_SSL_CIPHER_SUITES'] = 'HIGH+ECDSA'
-            import urllib3
-            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        
-        # Create the texttospeech client
-        try:
-            client = texttospeech.TextToSpeechLongAudioSynthesizeClient()
-            logging.info("Created TextToSpeechLongAudioSynthesizeClient successfully")
-        except Exception as e:
-            logging.error(f"Error creating TextToSpeechLongAudioSynthesizeClient: {e}")
-            # Try alternative client creation
-            from google.cloud.texttospeech import TextToSpeechClient
-            client = TextToSpeechClient()
-            logging.info("Falling back to standard TextToSpeechClient")
-        
-        # Configure storage client for output
-        storage_client = storage.Client()
-        
-        # Configure the voice request
-        voice = texttospeech.VoiceSelectionParams(
-            language_code=language_code,
-            name=voice_name
-        )
-        
-        # Long Audio API only supports LINEAR16 encoding
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.LINEAR16,
-            speaking_rate=speaking_rate,
-            pitch=pitch,
+        job = start_long_audio_synthesis(
+            text, output_filename, output_dir, language_code, voice_name, speaking_rate, pitch, audio_encoding
         )
-        
-        # Adjust output filename to have .wav extension since we use LINEAR16
-        output_filename_base = os.path.splitext(output_filename)[0]
-        output_filename_wav = f"{output_filename_base}.wav"
-        
-        # Create unique output path in GCS bucket
-        timestamp = int(time.time())
-        gcs_output_path = f"gs://{GCP_BUCKET_NAME}/tts_output_{timestamp}/{output_filename_wav}"
-        logging.info(f"Long Audio API output path: {gcs_output_path}")
-        
-        # Set the input based on whether text contains SSML tags
-        is_ssml = text.startswith("<speak>") and text.endswith("</speak>")
-        if is_ssml:
-            input_text = texttospeech.SynthesisInput(ssml=text)
-            logging.info("Using SSML input for Long Audio API")
-        else:
-            input_text = texttospeech.SynthesisInput(text=text)
-            logging.info("Using plain text input for Long Audio API")
-        
-        # Create the request
-        parent = f"projects/{GCP_PROJECT_ID}/locations/global"
-        
-        # Call the Long Audio API using the proper request format
-        request = texttospeech.SynthesizeLongAudioRequest(
-            parent=parent,
-            input=input_text,
-            voice=voice,
-            audio_config=audio_config,
-            output_gcs_uri=gcs_output_path
-        )
-        
-        logging.info("Starting Long Audio synthesis with proper request format")
-        operation = client.synthesize_long_audio(request=request)
-        
-        logging.info("Long Audio synthesis started, this may take several minutes...")
-        
-        # Wait for the operation to complete
-        response = operation.result(timeout=LONG_AUDIO_TIMEOUT_SECONDS)  # Using the configurable timeout
-        logging.info(f"Long Audio synthesis complete: {response}")
-        
-        # Download the result from GCS
-        bucket = storage_client.bucket(GCP_BUCKET_NAME)
-        # Extract the object name from gcs_output_path (remove 'gs://bucket_name/' part)
-        object_name = gcs_output_path.replace(f"gs://{GCP_BUCKET_NAME}/", "")
-        blob = bucket.blob(object_name)
-        
-        # Create local output path
-        local_output_path = os.path.join(output_dir, output_filename_wav)
-        
-        # Download the file to the specified path
-        blob.download_to_filename(local_output_path)
-        logging.info(f"Audio downloaded to: {local_output_path}")
-        
-        # If original request was for MP3, convert the WAV to MP3
-        if audio_encoding.upper() == "MP3" and AUTO_CONVERT_WAV_TO_MP3:
-            try:
-                from pydub import AudioSegment
-                mp3_path = os.path.join(output_dir, output_filename)
-                
-                # Load the WAV file
-                audio = AudioSegment.from_wav(local_output_path)
-                
-                # Apply audio parameters
-                audio = audio.set_frame_rate(AUDIO_SAMPLE_RATE)
-                audio = audio.set_sample_width(AUDIO_BIT_DEPTH // 8)  # Convert bits to bytes
-                audio = audio.set_channels(AUDIO_CHANNELS)
-                
-                # Export with the specified parameters
-                audio.export(
-                    mp3_path, 
-                    format="mp3", 
-                    bitrate=MP3_BITRATE,
-                    parameters=["-q:a", "0"]  # Use highest quality encoding
-                )
-                
-                logging.info(f"Converted WAV to MP3: {mp3_path} (bitrate: {MP3_BITRATE}, "
-                             f"sample rate: {AUDIO_SAMPLE_RATE} Hz, bit depth: {AUDIO_BIT_DEPTH}-bit, "
-                             f"channels: {AUDIO_CHANNELS})")
-                
-                # Remove the WAV file to save space
-                os.remove(local_output_path)
-                
-                # Return the MP3 path
-                return mp3_path
-            except Exception as e:
-                logging.error(f"Failed to convert WAV to MP3: {e}")
-                logging.info("Keeping WAV format")
-        
-        return local_output_path
-        
+        return finish_long_audio_synthesis(job)
     except Exception as e:
         logging.error(f"Error in Long Audio API synthesis: {e}")
         raise
 
 
-def get_safe_text_length(text, limit=STANDARD_TTS_CHAR_LIMIT):
+def write_long_audio_error(audio_dir, filename, error):
+    """Create an error placeholder file next to the audio of a chapter whose Long Audio synthesis failed."""
+    try:
+        error_filename = f"error_{filename}"
+        error_path = os.path.join(audio_dir, error_filename)
+        with open(error_path, "w", encoding="utf-8") as f:
+            f.write(f"Long Audio API failed: {error}")
+        logging.warning(f"Created error file at: {error_path}")
+    except Exception as write_error:
+        logging.error(f"Failed to create error file: {write_error}")
+
+
+class LongAudioJobManager:
     """
-    Calculate a safe text length that's guaranteed to be under the byte limit.
-    We need to account for the fact that some characters might be multi-byte.
+    Keeps many Long Audio operations of an audio folder running at once.
     
-    Parameters:
-        text: The text to truncate
-        limit: The maximum byte limit
+    Up to LONG_AUDIO_MAX_JOBS operations run at the same time; start() waits for a free slot.
+    The operation name of every started job is written to the long_audio_jobs.json journal of
+    the folder, so after a crash resume() picks the operations up again instead of submitting
+    the chapters once more. Jobs stay in the journal until their audio has been downloaded.
+    """
+    
+    def __init__(self, audio_dir, max_jobs=None):
+        self.audio_dir = audio_dir
+        self.journal_path = os.path.join(audio_dir, LONG_AUDIO_JOURNAL_FILE)
+        self.max_jobs = max(1, max_jobs or LONG_AUDIO_MAX_JOBS)
+        self.jobs = {}  # filename -> job
+        self.starting = 0
+        self.condition = threading.Condition()
+        self.poll_executor = ThreadPoolExecutor(max_workers=self.max_jobs)
+    
+    def _running_count(self):
+        return sum(1 for job in self.jobs.values() if not job.get("downloading")) + self.starting
+    
+    def _write_journal(self):
+        # Called with the condition held; operations themselves are not serializable
+        entries = {
+            filename: {key: value for key, value in job.items() if key not in ("operation", "downloading", "polling_since")}
+            for filename, job in self.jobs.items()
+        }
+        if not entries:
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            return
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, self.journal_path)
+    
+    def resume(self):
+        """Reload the operations recorded in the journal by an earlier run. Returns their number."""
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable Long Audio journal {self.journal_path}: {e}")
+            return 0
         
+        operations_client = get_long_audio_client().transport.operations_client
+        with self.condition:
+            for filename, job in entries.items():
+                try:
+                    job["operation"] = api_operation.from_gapic(
+                        operations_client.get_operation(job["operation_name"]),
+                        operations_client,
+                        texttospeech.SynthesizeLongAudioResponse,
+                        metadata_type=texttospeech.SynthesizeLongAudioMetadata,
+                    )
+                except Exception as e:
+                    logging.warning(f"Could not resume the Long Audio operation of {filename}, it will be started again: {e}")
+                    continue
+                # The timeout counts from the resume; started_at keeps the original start time
+                job["polling_since"] = time.time()
+                self.jobs[filename] = job
+                logging.info(f"Resumed Long Audio operation of {filename}: {job['operation_name']}")
+            self._write_journal()
+            return len(self.jobs)
+    
+    def is_running(self, filename, fingerprint):
+        """Return True if an operation for the same file, text and settings is already running."""
+        with self.condition:
+            job = self.jobs.get(filename)
+            return job is not None and job.get("fingerprint") == fingerprint
+    
+    def start(self, filename, fingerprint, **synthesis_args):
+        """
+        Start a Long Audio operation (see start_long_audio_synthesis for the arguments) once
+        fewer than max_jobs operations are running, and record it in the journal.
+        """
+        with self.condition:
+            while self._running_count() >= self.max_jobs:
+                self.condition.wait()
+            self.starting += 1
+        try:
+            job = start_long_audio_synthesis(**synthesis_args)
+            job["filename"] = filename
+            job["audio_dir"] = synthesis_args["output_dir"]
+            job["fingerprint"] = fingerprint
+            with self.condition:
+                # An operation left over for an older version of the file is replaced
+                self.jobs[filename] = job
+                self._write_journal()
+        finally:
+            with self.condition:
+                self.starting -= 1
+                self.condition.notify_all()
+        return job
+    
+    def running(self):
+        """Return True while any operation is running or being downloaded."""
+        with self.condition:
+            return bool(self.jobs) or self.starting > 0
+    
+    def _check(self, job):
+        try:
+            return job["operation"].done()
+        except Exception as e:
+            logging.warning(f"Could not check the Long Audio operation of {job['filename']}: {e}")
+            return False
+    
+    def poll(self):
+        """
+        Check all running operations concurrently.
+        Returns (job, error) for each operation that finished since the last call; error is
+        None if the audio is ready to download, or the TimeoutError of an operation that ran
+        longer than LONG_AUDIO_TIMEOUT_SECONDS (since it was started or resumed in this run).
+        """
+        with self.condition:
+            jobs = [job for job in self.jobs.values() if not job.get("downloading")]
+        finished = []
+        for job, is_done in zip(jobs, self.poll_executor.map(self._check, jobs)):
+            if is_done:
+                finished.append((job, None))
+            elif time.time() - job.get("polling_since", job["started_at"]) > LONG_AUDIO_TIMEOUT_SECONDS:
+                finished.append((job, TimeoutError(f"Long Audio operation did not finish within {LONG_AUDIO_TIMEOUT_SECONDS} seconds")))
+        with self.condition:
+            for job, _ in finished:
+                job["downloading"] = True
+            self.condition.notify_all()
+        return finished
+    
+    def remove(self, job):
+        """Forget a job whose audio was downloaded or which failed."""
+        with self.condition:
+            if self.jobs.get(job["filename"]) is job:
+                del self.jobs[job["filename"]]
+                self._write_journal()
+            self.condition.notify_all()
+    
+    def shutdown(self):
+        self.poll_executor.shutdown(wait=False)
+
+
+class TTSClient:
+    """
+    A client for the standard TTS REST endpoint, shared by all synthesis calls.
+    
+    It keeps one requests.Session with a pool of keep-alive connections, so parallel and
+    consecutive requests reuse connections instead of opening a new TLS connection each time.
+    Requests have explicit connect/read timeouts and are retried with exponential backoff on
+    429 and 5xx responses (honouring Retry-After).
+    """
+    
+    def __init__(self, pool_size=TTS_POOL_SIZE, max_retries=TTS_MAX_RETRIES,
+                 connect_timeout=TTS_CONNECT_TIMEOUT, read_timeout=TTS_READ_TIMEOUT):
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=1,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["POST"]),  # Synthesis requests are safe to repeat
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        if DISABLE_SSL_VERIFICATION:
+            self.session.verify = False
+    
+    def synthesize(self, payload):
+        """POST a synthesis request and return the response."""
+        if not API_TTS_KEY:
+            raise ValueError("API_TTS_KEY is not set in config.py or environment variables.")
+        return self.session.post(TTS_API_URL, params={"key": API_TTS_KEY}, json=payload, timeout=self.timeout)
+
+_tts_client = None
+_tts_client_lock = threading.Lock()
+
+def get_tts_client():
+    """Return the process-wide TTS client, creating it on first use."""
+    global _tts_client
+    with _tts_client_lock:
+        if _tts_client is None:
+            _tts_client = TTSClient(pool_size=max(TTS_POOL_SIZE, TTS_CHUNK_WORKERS))
+        return _tts_client
+
+# Places where a long text may be split: paragraph breaks, sentence ends and SSML pauses
+CHUNK_BOUNDARY = re.compile(r'\n\s*\n|(?<=[.!?…])["\'”’)\]]*\s+|<break\b[^>]*/>\s*')
+WORD_BOUNDARY = re.compile(r'\s+')
+SSML_TOKEN = re.compile(r'<(/?)[^>]*?(/?)>|&[#\w]+;')
+SSML_TAG_NAME = re.compile(r'<([^\s/>]+)')
+
+def _ssml_protected_spans(ssml):
+    """
+    Return the (start, end) spans of an SSML body that must not be split: tags and entities
+    (atomic spans), and the content of elements such as <emphasis>...</emphasis> (element spans).
+    """
+    atomic = []
+    elements = []
+    open_starts = []
+    for token in SSML_TOKEN.finditer(ssml):
+        atomic.append((token.start(), token.end()))
+        if token.group(0).startswith("&") or token.group(2):
+            continue
+        if token.group(1):
+            start = open_starts.pop() if open_starts else token.start()
+            if not open_starts:
+                elements.append((start, token.end()))
+        else:
+            open_starts.append(token.start())
+    return atomic, elements
+
+def _open_elements(ssml, position):
+    """Return the opening tags of the SSML elements still open at a position."""
+    stack = []
+    for token in SSML_TOKEN.finditer(ssml, 0, position):
+        if token.group(0).startswith("&") or token.group(2):
+            continue
+        if token.group(1):
+            if stack:
+                stack.pop()
+        else:
+            stack.append(token.group(0))
+    return stack
+
+def _span_checker(spans):
+    """Return a function telling whether a position lies outside all of the given sorted spans."""
+    starts = [start for start, _ in spans]
+    def allowed(position):
+        index = bisect_right(starts, position) - 1
+        return index < 0 or not (spans[index][0] < position < spans[index][1])
+    return allowed
+
+def _last_position(positions, start, end_limit):
+    """Return the largest position in a sorted list within (start, end_limit], or None."""
+    index = bisect_right(positions, end_limit) - 1
+    return positions[index] if index >= 0 and positions[index] > start else None
+
+def split_text_into_chunks(text, limit=STANDARD_TTS_CHAR_LIMIT):
+    """
+    Split processed text (plain or SSML) into chunks of at most `limit` UTF-8 bytes for the
+    standard TTS API.
+    
+    Chunks end at paragraph or sentence boundaries where possible, then at whitespace, and only
+    as a last resort in the middle of a word. SSML is never split inside a tag or an entity;
+    an element too long for one chunk is closed at the split and reopened in the next chunk,
+    and every SSML chunk is wrapped in its own <speak> tags.
+    
     Returns:
-        The safe length in characters to truncate to
+        List of chunks in reading order
     """
-    # Start with a conservative estimate - UTF-8 can use up to 4 bytes per character
-    safe_char_limit = limit // 4  
+    if len(text.encode('utf-8')) <= limit:
+        return [text]
     
-    # Binary search to find the optimal safe length
-    min_len = 0
-    max_len = min(len(text), limit)
+    is_ssml = text.startswith("<speak>") and text.endswith("</speak>")
+    body = text[len("<speak>"):-len("</speak>")] if is_ssml else text
+    budget = limit - (len("<speak></speak>") if is_ssml else 0)
     
-    while min_len <= max_len:
-        mid = (min_len + max_len) // 2
-        if len(text[:mid].encode('utf-8')) <= limit:
-            min_len = mid + 1
+    # Byte offset of every character position (identical for ASCII text)
+    if body.isascii():
+        byte_offsets = range(len(body) + 1)
+    else:
+        byte_offsets = [0]
+        for char in body:
+            byte_offsets.append(byte_offsets[-1] + len(char.encode('utf-8')))
+    
+    atomic, elements = _ssml_protected_spans(body) if is_ssml else ([], [])
+    outside_tags = _span_checker(atomic)
+    outside_elements = _span_checker(elements)
+    def allowed(position):
+        return outside_tags(position) and outside_elements(position)
+    
+    boundaries = [m.end() for m in CHUNK_BOUNDARY.finditer(body) if allowed(m.end())]
+    words = word_splits = None
+    
+    chunks = []
+    start = 0
+    reopen = ""  # Opening tags of elements continued from the previous chunk
+    while start < len(body):
+        closing = ""
+        # Furthest position that keeps the chunk within the byte budget
+        room = budget - len(reopen.encode('utf-8'))
+        end_limit = bisect_right(byte_offsets, byte_offsets[start] + room) - 1
+        if end_limit >= len(body):
+            end = len(body)
         else:
-            max_len = mid - 1
+            end = _last_position(boundaries, start, end_limit)
+            if end is None:
+                # A single sentence is over the limit: split it between words
+                if words is None:
+                    words = [m.end() for m in WORD_BOUNDARY.finditer(body) if outside_tags(m.end())]
+                    word_splits = [position for position in words if outside_elements(position)]
+                end = _last_position(word_splits, start, end_limit)
+            if end is None and is_ssml:
+                # The limit falls inside a long element: close it here and reopen it in the next chunk
+                candidate = end_limit
+                while end is None:
+                    candidate = _last_position(words, start, candidate)
+                    if candidate is None:
+                        break
+                    open_tags = _open_elements(body, candidate)
+                    closing = "".join(f"</{SSML_TAG_NAME.match(tag).group(1)}>" for tag in reversed(open_tags))
+                    if byte_offsets[candidate] - byte_offsets[start] + len(closing) <= room:
+                        end = candidate
+                    else:
+                        candidate -= 1
+            if end is None:
+                closing = ""
+                end = end_limit
+                while end > start and not outside_tags(end):
+                    end -= 1
+                if end <= start:
+                    end = end_limit
+                logging.warning("Could not find a safe place to split the text, cutting in the middle of a word")
+        chunk = (reopen + body[start:end] + closing).strip()
+        if chunk:
+            chunks.append(f"<speak>{chunk}</speak>" if is_ssml else chunk)
+        reopen = "".join(_open_elements(body, end)) if closing else ""
+        start = end
+    
+    logging.info(f"Split {len(text)} characters into {len(chunks)} chunks for the standard API")
+    return chunks
+
+def request_synthesis(text, language_code, voice_name, speaking_rate, pitch, audio_encoding):
+    """
+    Synthesize one text (or SSML) of at most STANDARD_TTS_CHAR_LIMIT bytes with the standard API
+    and return the audio bytes. Segments already synthesized with the same voice settings are
+    served from the audio cache (USE_TTS_CACHE) instead.
+    """
+    cache = get_audio_cache(TTS_CACHE_FOLDER, TTS_CACHE_MAX_MB * 1024 * 1024, USE_TTS_CACHE)
+    cache_key = audio_fingerprint(text, language_code, voice_name, speaking_rate, pitch, audio_encoding)
+    audio_bytes = cache.get(cache_key)
+    if audio_bytes is not None:
+        logging.info(f"Using cached audio for {len(text)} characters")
+        return audio_bytes
+    
+    # Configure the input type based on whether SSML is used
+    is_ssml = text.startswith("<speak>") and text.endswith("</speak>")
+    payload = {
+        "input": {"ssml": text} if is_ssml else {"text": text},
+        "voice": {"languageCode": language_code, "name": voice_name},
+        "audioConfig": {
+            "audioEncoding": audio_encoding,
+            "speakingRate": speaking_rate,
+            "pitch": pitch,
+        },
+    }
+    
+    # Log the first part of the payload for debugging
+    if is_ssml and len(text) > 100:
+        logging.info(f"API Request payload: {dict(payload, input={'ssml': text[:100] + '...'})}")
+    else:
+        logging.info(f"API Request payload: {payload}")
+    
+    response = get_tts_client().synthesize(payload)
+    if response.status_code != 200:
+        logging.error(f"API Error: {response.status_code} {response.reason}")
+        try:
+            error_details = response.json()
+            logging.error(f"API Error details: {error_details}")
+        except ValueError:
+            logging.error(f"Raw response: {response.text[:500]}")
+    response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
+    
+    response_data = response.json()
+    audio_content = response_data.get("audioContent")
+    if not audio_content:
+        logging.error(f"TTS API did not return audio content. Response: {response_data}")
+        raise RuntimeError("No audioContent returned from TTS API")
+    
+    try:
+        audio_bytes = base64.b64decode(audio_content)
+    except (TypeError, base64.binascii.Error) as e:
+        logging.error(f"Failed to decode base64 audio content: {e}")
+        raise
+    
+    cache.put(cache_key, audio_bytes)
+    return audio_bytes
+
+def concatenate_audio(parts, audio_encoding):
+    """
+    Join audio returned for consecutive chunks into one file.
+    MP3 and OGG_OPUS streams can be appended as they are; LINEAR16 responses are WAV files,
+    so their frames are merged under a single header.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    if audio_encoding.upper() == "LINEAR16":
+        try:
+            output = io.BytesIO()
+            with wave.open(output, "wb") as merged:
+                for index, part in enumerate(parts):
+                    with wave.open(io.BytesIO(part), "rb") as chunk:
+                        if index == 0:
+                            merged.setparams(chunk.getparams())
+                        merged.writeframes(chunk.readframes(chunk.getnframes()))
+            return output.getvalue()
+        except (wave.Error, EOFError) as e:
+            logging.warning(f"Could not merge WAV chunks ({e}), appending them as they are")
+    return b"".join(parts)
+
+def synthesize_chunked(
+    processed_text: str,
+    output_path: str,
+    language_code: str = DEFAULT_LANGUAGE_CODE,
+    voice_name: str = DEFAULT_VOICE_NAME,
+    speaking_rate: float = DEFAULT_SPEAKING_RATE,
+    pitch: float = DEFAULT_PITCH,
+    audio_encoding: str = DEFAULT_AUDIO_ENCODING,
+) -> str:
+    """
+    Synthesize a text of any length with the standard API: split it into chunks under the byte
+    limit, synthesize the chunks in parallel (TTS_CHUNK_WORKERS) and write the audio in order
+    to a single file.
+    
+    Returns:
+        The path of the written audio file
+    """
+    chunks = split_text_into_chunks(processed_text)
+    logging.info(f"Synthesizing {len(chunks)} chunks with the standard API ({TTS_CHUNK_WORKERS} in parallel)")
+    
+    def synthesize_chunk(chunk):
+        return request_synthesis(chunk, language_code, voice_name, speaking_rate, pitch, audio_encoding)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(TTS_CHUNK_WORKERS, len(chunks)))) as executor:
+            parts = list(executor.map(synthesize_chunk, chunks))
+    except requests.exceptions.RequestException as e:
+        logging.error(f"HTTP Request failed while synthesizing chunks: {e}")
+        raise
     
-    # max_len is now the largest length that stays under the byte limit
-    return max_len
+    with open(output_path, "wb") as out_f:
+        out_f.write(concatenate_audio(parts, audio_encoding))
+    logging.info(f"Audio content of {len(chunks)} chunks written to {output_path}")
+    return output_path
 
 
 def synthesize_text_to_file(
@@ -652,47 +1559,17 @@ def synthesize_text_to_file(
     # Prepare REST request to Google TTS API
     if not API_TTS_KEY:
         raise ValueError("API_TTS_KEY is not set in config.py or environment variables.")
-
-    url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={API_TTS_KEY}"
-    
-    # Check if the processed text has SSML tags
-    is_ssml = processed_text.startswith("<speak>") and processed_text.endswith("</speak>")
-    
-    # Configure the input type based on whether SSML is used
-    if is_ssml:
-        input_data = {"ssml": processed_text}
-        logging.info("Using SSML input for speech synthesis")
-    else:
-        input_data = {"text": processed_text}
-        logging.info("Using plain text input for speech synthesis")
-    
-    payload = {
-        "input": input_data,
-        "voice": {"languageCode": language_code, "name": voice_name},
-        "audioConfig": {
-            "audioEncoding": audio_encoding,
-            "speakingRate": speaking_rate,
-            "pitch": pitch,
-        },
-    }
-    
-    # Log the first part of the payload for debugging
-    safe_payload = payload.copy()
-    if "input" in safe_payload and "ssml" in safe_payload["input"]:
-        ssml_content = safe_payload["input"]["ssml"]
-        safe_payload["input"]["ssml"] = ssml_content[:100] + "..." if len(ssml_content) > 100 else ssml_content
-    logging.info(f"API Request payload: {safe_payload}")
     
+    # Texts over the byte limit of the standard API are synthesized in chunks
+    if len(processed_text.encode('utf-8')) > STANDARD_TTS_CHAR_LIMIT:
+        return synthesize_chunked(
+            processed_text, output_path, language_code, voice_name, speaking_rate, pitch, audio_encoding
+        )
+
     try:
-        response = requests.post(url, json=payload)
-        if response.status_code != 200:
-            logging.error(f"API Error: {response.status_code} {response.reason}")
-            try:
-                error_details = response.json()
-                logging.error(f"API Error details: {error_details}")
-            except:
-                logging.error(f"Raw response: {response.text[:500]}")
-        response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
+        audio_bytes = request_synthesis(
+            processed_text, language_code, voice_name, speaking_rate, pitch, audio_encoding
+        )
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 403:
             logging.error(f"HTTP Request failed: {e}")
@@ -722,27 +1599,14 @@ def synthesize_text_to_file(
         logging.info("Creating error placeholder audio file")
         try:
             # Write a minimal mp3 file that indicates an error
-            error_url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={API_TTS_KEY}"
-            error_payload = {
-                "input": {"text": "There was an error processing this text with the Text to Speech API."},
-                "voice": {"languageCode": language_code, "name": voice_name},
-                "audioConfig": {
-                    "audioEncoding": audio_encoding,
-                    "speakingRate": speaking_rate,
-                    "pitch": pitch,
-                },
-            }
-            
-            error_response = requests.post(error_url, json=error_payload)
-            if error_response.status_code == 200:
-                error_data = error_response.json()
-                error_audio = error_data.get("audioContent")
-                if error_audio:
-                    error_bytes = base64.b64decode(error_audio)
-                    with open(output_path, "wb") as out_f:
-                        out_f.write(error_bytes)
-                    logging.info(f"Created error audio placeholder: {output_path}")
-                    return output_path
+            error_bytes = request_synthesis(
+                "There was an error processing this text with the Text to Speech API.",
+                language_code, voice_name, speaking_rate, pitch, audio_encoding
+            )
+            with open(output_path, "wb") as out_f:
+                out_f.write(error_bytes)
+            logging.info(f"Created error audio placeholder: {output_path}")
+            return output_path
         except:
             logging.error("Failed to create error audio placeholder")
             
@@ -760,19 +1624,6 @@ def synthesize_text_to_file(
         logging.error(f"HTTP Request failed: {e}")
         raise
 
-    response_data = response.json()
-    audio_content = response_data.get("audioContent")
-
-    if not audio_content:
-        logging.error(f"TTS API did not return audio content. Response: {response_data}")
-        raise RuntimeError("No audioContent returned from TTS API")
-
-    try:
-        audio_bytes = base64.b64decode(audio_content)
-    except (TypeError, base64.binascii.Error) as e:
-        logging.error(f"Failed to decode base64 audio content: {e}")
-        raise
-
     try:
         with open(output_path, "wb") as out_f:
             out_f.write(audio_bytes)
@@ -783,12 +1634,190 @@ def synthesize_text_to_file(
         raise
 
 
-def process_folder_input(folder_name):
+def audio_fingerprint(processed_text, language_code, voice_name, speaking_rate, pitch, audio_encoding):
+    """Hash the processed text and the voice settings that determine the audio of a file."""
+    payload = json.dumps(
+        [processed_text, language_code, voice_name, speaking_rate, pitch, audio_encoding.upper()],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class AudioManifest:
+    """
+    The audio_manifest.json of an audio folder: for each output file, the fingerprint of the
+    text and settings it was synthesized from and the name of the file actually written
+    (Long Audio output may end up as .wav). Only files whose fingerprint changed need audio.
+    """
+    
+    def __init__(self, audio_dir):
+        self.path = os.path.join(audio_dir, AUDIO_MANIFEST_FILE)
+        self.audio_dir = audio_dir
+        self.lock = threading.Lock()
+        self.entries = {}
+        # Audio made before the manifest existed is only adopted by the run that creates it
+        self.adopt_existing = not os.path.exists(self.path)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable audio manifest {self.path}: {e}")
+    
+    def is_current(self, filename, fingerprint):
+        """Return the path of the audio for a file if it was made from the same fingerprint, else None."""
+        with self.lock:
+            entry = self.entries.get(filename)
+        if entry is None:
+            # Audio made before the manifest existed is adopted as current once
+            output_path = os.path.join(self.audio_dir, filename)
+            if self.adopt_existing and os.path.exists(output_path):
+                logging.info(f"Recording existing audio in the manifest: {output_path}")
+                self.record(filename, fingerprint, output_path)
+                return output_path
+            return None
+        output_path = os.path.join(self.audio_dir, entry.get("output", filename))
+        if entry.get("fingerprint") == fingerprint and os.path.exists(output_path):
+            return output_path
+        return None
+    
+    def record(self, filename, fingerprint, output_path):
+        """
+        Remember the fingerprint of a synthesized file. Placeholders written after a failure are
+        recorded with FAILED_AUDIO_FINGERPRINT, which never matches, so they are retried next run.
+        """
+        with self.lock:
+            self.entries[filename] = {
+                "fingerprint": fingerprint,
+                "output": os.path.basename(output_path),
+                "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            # Write to a temporary file first so an interrupted run never leaves a broken manifest
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+_audio_manifests = {}
+_audio_manifests_lock = threading.Lock()
+
+def get_audio_manifest(audio_dir):
+    """Return the manifest of an audio folder, shared by all threads working on that folder."""
+    key = os.path.abspath(audio_dir)
+    with _audio_manifests_lock:
+        if key not in _audio_manifests:
+            os.makedirs(audio_dir, exist_ok=True)
+            _audio_manifests[key] = AudioManifest(audio_dir)
+        return _audio_manifests[key]
+
+def synthesize_chapter_file(file_path, output_file, folder_name, folder_base_path, long_audio_jobs=None):
+    """Read a chapter markdown file and synthesize it into the audio folder of the project."""
+    # Read the markdown file
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text_content = f.read()
+    
+    # Process the text through TTS
+    return synthesize_text_to_folder(
+        text=text_content,
+        filename=output_file,
+        folder_name=folder_name,
+        preprocess_md=DEFAULT_PREPROCESS_MARKDOWN,
+        exclude_tables=DEFAULT_EXCLUDE_TABLES,
+        save_text=DEFAULT_SAVE_TEXT,
+        folder_base_path=folder_base_path,
+        long_audio_jobs=long_audio_jobs
+    )
+
+def synthesize_files_in_parallel(tasks, folder_name, folder_base_path, workers):
+    """
+    Synthesize chapter files concurrently and report each chapter as soon as it finishes.
+    
+    Chapters for the standard API run in a pool of `workers` threads. Chapters that need the
+    Long Audio API only start their operation in the pool, through a LongAudioJobManager that
+    journals them; all running operations (including those resumed from an interrupted run)
+    are polled together every LONG_AUDIO_POLL_SECONDS, and their audio is downloaded in the
+    pool as each one completes.
+    
+    Parameters:
+        tasks: List of (markdown file name, file path, output file name)
+        folder_name: The name of the input folder
+        folder_base_path: Base path of the project folder
+        workers: Number of threads
+    
+    Returns:
+        The number of chapters for which audio was created
+    """
+    total = len(tasks)
+    finished = 0
+    success_count = 0
+    start_time = time.time()
+    chapter_names = {output_file: md_file for md_file, _, output_file in tasks}
+    
+    long_audio_jobs = LongAudioJobManager(os.path.join(folder_base_path, "audio"))
+    if not MOCK_MODE and USE_LONG_AUDIO_API:
+        resumed = long_audio_jobs.resume()
+        if resumed:
+            logging.info(f"Resumed {resumed} Long Audio operations from an earlier run")
+    
+    def report(md_file, status):
+        nonlocal finished
+        finished += 1
+        logging.info(f"[{finished}/{total}] {md_file}: {status} ({time.time() - start_time:.0f}s)")
+    
+    logging.info(f"Synthesizing {total} files with {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Future -> (markdown file name, Long Audio job being downloaded or None)
+        pending = {
+            executor.submit(synthesize_chapter_file, file_path, output_file, folder_name, folder_base_path, long_audio_jobs): (md_file, None)
+            for md_file, file_path, output_file in tasks
+        }
+        while pending or long_audio_jobs.running():
+            if pending:
+                done, _ = wait(list(pending), timeout=LONG_AUDIO_POLL_SECONDS if long_audio_jobs.running() else None,
+                               return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+                time.sleep(LONG_AUDIO_POLL_SECONDS)
+            
+            for future in done:
+                md_file, job = pending.pop(future)
+                try:
+                    output_path = future.result()
+                except Exception as e:
+                    if job is not None:
+                        long_audio_jobs.remove(job)
+                        write_long_audio_error(job["audio_dir"], job["filename"], e)
+                    report(md_file, f"failed: {e}")
+                    continue
+                if output_path is None:
+                    logging.info(f"{md_file}: Long Audio operation started")
+                    continue
+                if job is not None:
+                    get_audio_manifest(job["audio_dir"]).record(job["filename"], job["fingerprint"], output_path)
+                    long_audio_jobs.remove(job)
+                report(md_file, f"created {output_path}")
+                success_count += 1
+            
+            # Download the audio of the Long Audio operations that completed
+            for job, error in long_audio_jobs.poll():
+                md_file = chapter_names.get(job["filename"], job["filename"])
+                if error is not None:
+                    long_audio_jobs.remove(job)
+                    write_long_audio_error(job["audio_dir"], job["filename"], error)
+                    report(md_file, f"failed: {error}")
+                else:
+                    pending[executor.submit(finish_long_audio_synthesis, job)] = (md_file, job)
+    
+    long_audio_jobs.shutdown()
+    return success_count
+
+def process_folder_input(folder_name, workers=None):
     """
     Process all markdown files in the PROJECT_FOLDER/folder_name/chapters directory.
     
     Parameters:
         folder_name: The name of the input folder
+        workers: Number of chapters to synthesize in parallel (default: FOLDER_WORKERS)
     
     Returns:
         True if at least one file was processed, False otherwise
@@ -844,54 +1873,34 @@ def process_folder_input(folder_name):
         logging.info(f"Creating text output directory: {text_output_dir}")
         os.makedirs(text_output_dir, exist_ok=True)
     
-    # Process each file
-    success_count = 0
-    skip_count = 0
-    for md_file in markdown_files:
+    # Collect the files; unchanged ones are skipped using the audio manifest of the folder
+    tasks = []
+    for md_file in sorted(markdown_files):
         file_path = os.path.join(chapters_path, md_file)
         base_name = os.path.splitext(md_file)[0]
         output_file = f"{base_name}.{DEFAULT_AUDIO_ENCODING.lower()}"
-        output_path = os.path.join(audio_output_dir, output_file)
-        
-        # Check if file already exists and should be skipped
-        if SKIP_EXISTING_AUDIO_FILES and os.path.exists(output_path):
-            logging.info(f"Skipping {md_file} as output file already exists: {output_path}")
-            skip_count += 1
-            continue
-        
-        logging.info(f"Processing file: {file_path}")
-        
-        try:
-            # Read the markdown file
-            with open(file_path, 'r', encoding='utf-8') as f:
-                text_content = f.read()
-            
-            # Process the text through TTS
-            output_path = synthesize_text_to_folder(
-                text=text_content,
-                filename=output_file,
-                folder_name=folder_name,
-                preprocess_md=DEFAULT_PREPROCESS_MARKDOWN,
-                exclude_tables=DEFAULT_EXCLUDE_TABLES,
-                save_text=DEFAULT_SAVE_TEXT,
-                folder_base_path=folder_base_path
-            )
-            
-            logging.info(f"Created audio file: {output_path}")
-            success_count += 1
+        tasks.append((md_file, file_path, output_file))
+    
+    # Process the files, in parallel if more than one worker is configured
+    workers = workers or FOLDER_WORKERS
+    if workers > 1 and len(tasks) > 1:
+        success_count = synthesize_files_in_parallel(tasks, folder_name, folder_base_path, workers)
+    else:
+        success_count = 0
+        for md_file, file_path, output_file in tasks:
+            logging.info(f"Processing file: {file_path}")
             
-        except Exception as e:
-            logging.error(f"Error processing file {file_path}: {e}")
-            continue
+            try:
+                output_path = synthesize_chapter_file(file_path, output_file, folder_name, folder_base_path)
+                logging.info(f"Created audio file: {output_path}")
+                success_count += 1
+                
+            except Exception as e:
+                logging.error(f"Error processing file {file_path}: {e}")
+                continue
     
-    if skip_count > 0:
-        logging.info(f"Skipped {skip_count} files that already exist")
-        
     if success_count > 0:
-        logging.info(f"Successfully processed {success_count} of {len(markdown_files) - skip_count} files")
-        return True
-    elif skip_count > 0:
-        logging.info(f"No new files processed, but {skip_count} existing files were skipped")
+        logging.info(f"Successfully processed {success_count} of {len(markdown_files)} files (including files that were already up to date)")
         return True
     else:
         logging.error("Failed to process any files")
@@ -910,6 +1919,7 @@ def synthesize_text_to_folder(
     exclude_tables: bool = DEFAULT_EXCLUDE_TABLES,
     save_text: bool = DEFAULT_SAVE_TEXT,
     folder_base_path: str = None,
+    long_audio_jobs: "LongAudioJobManager" = None,
 ) -> str:
     """
     Synthesizes speech from the given text and saves it directly to the folder structure.
@@ -928,6 +1938,8 @@ def synthesize_text_to_folder(
         exclude_tables: Whether to exclude tables from the text sent to the TTS API
         save_text: Whether to save the processed text alongside the audio file
         folder_base_path: Base path for the folder (if None, will use PROJECT_FOLDER/folder_name)
+        long_audio_jobs: If given, a Long Audio operation is only started with this job manager
+            instead of waiting for it; the function then returns None
     """
     # Define output paths
     if folder_base_path:
@@ -940,12 +1952,6 @@ def synthesize_text_to_folder(
         if save_text:
             text_dir = os.path.join(PROJECT_FOLDER, folder_name, "text")
     
-    # Check if output file already exists
-    output_path = os.path.join(audio_dir, filename)
-    if SKIP_EXISTING_AUDIO_FILES and os.path.exists(output_path):
-        logging.info(f"Output file already exists, skipping: {output_path}")
-        return output_path
-    
     # Check if voice supports SSML
     use_ssml = USE_SSML and voice_name in SSML_COMPATIBLE_VOICES and not FORCE_PLAIN_TEXT
     if USE_SSML and voice_name not in SSML_COMPATIBLE_VOICES:
@@ -962,6 +1968,15 @@ def synthesize_text_to_folder(
         voice_name=voice_name
     )
     
+    # Skip the file if its audio was made from the same text and settings
+    manifest = get_audio_manifest(audio_dir) if not MOCK_MODE else None
+    fingerprint = audio_fingerprint(processed_text, language_code, voice_name, speaking_rate, pitch, audio_encoding)
+    if manifest and SKIP_EXISTING_AUDIO_FILES:
+        current_path = manifest.is_current(filename, fingerprint)
+        if current_path:
+            logging.info(f"Audio is up to date, skipping: {current_path}")
+            return current_path
+    
     # Save the processed text if requested
     if save_text and not MOCK_MODE:
         text_filename = os.path.splitext(filename)[0] + ".txt"
@@ -1013,13 +2028,32 @@ def synthesize_text_to_folder(
         
         # Check if the required GCP configs are available
         if not GCP_PROJECT_ID or GCP_PROJECT_ID == 'YOUR_GCP_PROJECT_ID' or not GCP_BUCKET_NAME or GCP_BUCKET_NAME == 'YOUR_GCP_BUCKET_NAME':
-            logging.warning("GCP project ID or bucket name not configured properly. Falling back to standard API with truncated text.")
-            safe_length = get_safe_text_length(processed_text)
-            processed_text = processed_text[:safe_length]
-            logging.warning(f"Text truncated to {safe_length} characters for standard API")
+            logging.warning("GCP project ID or bucket name not configured properly. Falling back to chunked synthesis with the standard API.")
+        elif long_audio_jobs is not None:
+            if long_audio_jobs.is_running(filename, fingerprint):
+                logging.info(f"Long Audio operation for {filename} is still running from an earlier run")
+                return None
+            try:
+                long_audio_jobs.start(
+                    filename,
+                    fingerprint,
+                    text=processed_text,
+                    output_filename=filename,
+                    output_dir=audio_dir,
+                    language_code=language_code,
+                    voice_name=voice_name,
+                    speaking_rate=speaking_rate,
+                    pitch=pitch,
+                    audio_encoding=audio_encoding,
+                )
+            except Exception as e:
+                logging.error(f"Long Audio API failed: {e}")
+                write_long_audio_error(audio_dir, filename, e)
+                raise
+            return None
         else:
             try:
-                return synthesize_with_long_audio_api(
+                output_path = synthesize_with_long_audio_api(
                     text=processed_text,
                     output_filename=filename,
                     output_dir=audio_dir,
@@ -1029,106 +2063,31 @@ def synthesize_text_to_folder(
                     pitch=pitch,
                     audio_encoding=audio_encoding,
                 )
+                manifest.record(filename, fingerprint, output_path)
+                return output_path
             except Exception as e:
                 logging.error(f"Long Audio API failed: {e}")
                 # Create error placeholder file instead of falling back to standard API
-                try:
-                    error_filename = f"error_{filename}"
-                    error_path = os.path.join(audio_dir, error_filename)
-                    with open(error_path, "w", encoding="utf-8") as f:
-                        f.write(f"Long Audio API failed: {e}")
-                    logging.warning(f"Created error file at: {error_path}")
-                except Exception as write_error:
-                    logging.error(f"Failed to create error file: {write_error}")
+                write_long_audio_error(audio_dir, filename, e)
                 # Raise the original exception instead of falling back
                 raise
     
-    # Check if text is too long even for Long Audio API
-    if text_length > LONG_TTS_CHAR_LIMIT:
-        logging.warning(f"Text is too long ({text_length} chars) even for Long Audio API. Creating placeholder.")
-        # Create a placeholder mp3 file
-        try:
-            # Write a minimal mp3 file that indicates the error
-            url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={API_TTS_KEY}"
-            placeholder_payload = {
-                "input": {"text": "This text was too long to process with the Text to Speech API."},
-                "voice": {"languageCode": language_code, "name": voice_name},
-                "audioConfig": {
-                    "audioEncoding": audio_encoding,
-                    "speakingRate": speaking_rate,
-                    "pitch": pitch,
-                },
-            }
-            
-            response = requests.post(url, json=placeholder_payload)
-            if response.status_code == 200:
-                response_data = response.json()
-                audio_content = response_data.get("audioContent")
-                if audio_content:
-                    audio_bytes = base64.b64decode(audio_content)
-                    with open(output_path, "wb") as out_f:
-                        out_f.write(audio_bytes)
-                    logging.info(f"Created placeholder audio for too-long text: {output_path}")
-                    return output_path
-            
-            # If the above fails, create an empty file
-            with open(output_path, "wb") as out_f:
-                out_f.write(b"")
-            logging.warning(f"Created empty placeholder file for too-long text: {output_path}")
-            return output_path
-            
-        except Exception as e:
-            logging.error(f"Failed to create placeholder for too-long text: {e}")
-            raise
-    
-    # If text length is appropriate for standard API, use it
-    # Do one final check to make sure we're under the byte limit
-    if len(processed_text.encode('utf-8')) > 5000:
-        safe_length = get_safe_text_length(processed_text)
-        processed_text = processed_text[:safe_length]
-        logging.warning(f"Text truncated to {safe_length} characters to stay under byte limit")
+    # Texts over the byte limit of the standard API (and too long for, or not sent to, the
+    # Long Audio API) are split into chunks that are synthesized in parallel
+    if len(processed_text.encode('utf-8')) > STANDARD_TTS_CHAR_LIMIT:
+        if text_length > LONG_TTS_CHAR_LIMIT:
+            logging.warning(f"Text is too long ({text_length} chars) for the Long Audio API. Using chunked synthesis.")
+        synthesize_chunked(
+            processed_text, output_path, language_code, voice_name, speaking_rate, pitch, audio_encoding
+        )
+        manifest.record(filename, fingerprint, output_path)
+        return output_path
         
     logging.info(f"Using standard TTS API for {len(processed_text)} characters ({len(processed_text.encode('utf-8'))} bytes)")
-    url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={API_TTS_KEY}"
-    
-    # Check if the processed text has SSML tags
-    is_ssml = processed_text.startswith("<speak>") and processed_text.endswith("</speak>")
-    
-    # Configure the input type based on whether SSML is used
-    if is_ssml:
-        input_data = {"ssml": processed_text}
-        logging.info("Using SSML input for speech synthesis")
-    else:
-        input_data = {"text": processed_text}
-        logging.info("Using plain text input for speech synthesis")
-        
-    payload = {
-        "input": input_data,
-        "voice": {"languageCode": language_code, "name": voice_name},
-        "audioConfig": {
-            "audioEncoding": audio_encoding,
-            "speakingRate": speaking_rate,
-            "pitch": pitch,
-        },
-    }
-    
-    # Log the first part of the payload for debugging
-    safe_payload = payload.copy()
-    if "input" in safe_payload and "ssml" in safe_payload["input"]:
-        ssml_content = safe_payload["input"]["ssml"]
-        safe_payload["input"]["ssml"] = ssml_content[:100] + "..." if len(ssml_content) > 100 else ssml_content
-    logging.info(f"API Request payload: {safe_payload}")
-    
     try:
-        response = requests.post(url, json=payload)
-        if response.status_code != 200:
-            logging.error(f"API Error: {response.status_code} {response.reason}")
-            try:
-                error_details = response.json()
-                logging.error(f"API Error details: {error_details}")
-            except:
-                logging.error(f"Raw response: {response.text[:500]}")
-        response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
+        audio_bytes = request_synthesis(
+            processed_text, language_code, voice_name, speaking_rate, pitch, audio_encoding
+        )
     except requests.exceptions.HTTPError as e:
         if e.response.status_code == 403:
             logging.error(f"HTTP Request failed: {e}")
@@ -1158,27 +2117,15 @@ def synthesize_text_to_folder(
         logging.info("Creating error placeholder audio file")
         try:
             # Write a minimal mp3 file that indicates an error
-            error_url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={API_TTS_KEY}"
-            error_payload = {
-                "input": {"text": "There was an error processing this text with the Text to Speech API."},
-                "voice": {"languageCode": language_code, "name": voice_name},
-                "audioConfig": {
-                    "audioEncoding": audio_encoding,
-                    "speakingRate": speaking_rate,
-                    "pitch": pitch,
-                },
-            }
-            
-            error_response = requests.post(error_url, json=error_payload)
-            if error_response.status_code == 200:
-                error_data = error_response.json()
-                error_audio = error_data.get("audioContent")
-                if error_audio:
-                    error_bytes = base64.b64decode(error_audio)
-                    with open(output_path, "wb") as out_f:
-                        out_f.write(error_bytes)
-                    logging.info(f"Created error audio placeholder: {output_path}")
-                    return output_path
+            error_bytes = request_synthesis(
+                "There was an error processing this text with the Text to Speech API.",
+                language_code, voice_name, speaking_rate, pitch, audio_encoding
+            )
+            with open(output_path, "wb") as out_f:
+                out_f.write(error_bytes)
+            logging.info(f"Created error audio placeholder: {output_path}")
+            manifest.record(filename, FAILED_AUDIO_FINGERPRINT, output_path)
+            return output_path
         except:
             logging.error("Failed to create error audio placeholder")
             
@@ -1187,6 +2134,7 @@ def synthesize_text_to_folder(
             with open(output_path, "wb") as out_f:
                 out_f.write(b"")
             logging.warning(f"Created empty file due to API error: {output_path}")
+            manifest.record(filename, FAILED_AUDIO_FINGERPRINT, output_path)
             return output_path
         except:
             pass
@@ -1196,23 +2144,11 @@ def synthesize_text_to_folder(
         logging.error(f"HTTP Request failed: {e}")
         raise
 
-    response_data = response.json()
-    audio_content = response_data.get("audioContent")
-
-    if not audio_content:
-        logging.error(f"TTS API did not return audio content. Response: {response_data}")
-        raise RuntimeError("No audioContent returned from TTS API")
-
-    try:
-        audio_bytes = base64.b64decode(audio_content)
-    except (TypeError, base64.binascii.Error) as e:
-        logging.error(f"Failed to decode base64 audio content: {e}")
-        raise
-
     try:
         with open(output_path, "wb") as out_f:
             out_f.write(audio_bytes)
         logging.info(f"Audio content written to {output_path}")
+        manifest.record(filename, fingerprint, output_path)
         return output_path
     except IOError as e:
         logging.error(f"Failed to write audio file to {output_path}: {e}")
@@ -1281,7 +2217,7 @@ def main():
     )
     parser.add_argument(
         "--no-skip-existing", action="store_true",
-        help="Don't skip existing audio files (by default existing files are skipped)"
+        help="Re-synthesize all files (by default files whose text and voice settings are unchanged are skipped)"
     )
     parser.add_argument(
         "--long-audio-timeout", type=int,
@@ -1295,10 +2231,34 @@ def main():
         "--ssml-rules-file", 
         help=f"Path to SSML rules file (default: {SSML_RULES_FILE})"
     )
+    parser.add_argument(
+        "--validate-ssml", action="store_true",
+        help="Parse the generated SSML as XML and fall back to plain text if it is invalid"
+    )
     parser.add_argument(
         "--markdown-rules-file", 
         help=f"Path to markdown rules file (default: {MARKDOWN_RULES_FILE})"
     )
+    parser.add_argument(
+        "--md-engine", choices=["regex", "fast"],
+        help=f"Markdown preprocessing engine: 'regex' applies the rules file, 'fast' uses the built-in single-pass converter (default: {MARKDOWN_ENGINE})"
+    )
+    parser.add_argument(
+        "--workers", type=int,
+        help=f"Number of chapters to synthesize in parallel in folder mode (default: {FOLDER_WORKERS})"
+    )
+    parser.add_argument(
+        "--long-audio-jobs", type=int,
+        help=f"Maximum number of Long Audio operations running at once in folder mode (default: {LONG_AUDIO_MAX_JOBS})"
+    )
+    parser.add_argument(
+        "--no-tts-cache", action="store_true",
+        help=f"Always call the TTS API instead of reusing audio segments cached in {TTS_CACHE_FOLDER}"
+    )
+    parser.add_argument(
+        "--tts-cache-max-mb", type=int,
+        help=f"Maximum size of the TTS audio cache in MB (default: {TTS_CACHE_MAX_MB})"
+    )
     parser.add_argument(
         "--debug", action="store_true",
         help="Enable debug logging for detailed information"
@@ -1355,7 +2315,7 @@ def main():
     
     # Update global parameters if needed
     def update_globals():
-        global MOCK_MODE, AUTO_CONVERT_WAV_TO_MP3, MP3_BITRATE, AUDIO_SAMPLE_RATE, AUDIO_BIT_DEPTH, AUDIO_CHANNELS, SKIP_EXISTING_AUDIO_FILES, LONG_AUDIO_TIMEOUT_SECONDS, USE_SSML, SSML_RULES_FILE, FORCE_PLAIN_TEXT, MARKDOWN_RULES_FILE
+        global MOCK_MODE, AUTO_CONVERT_WAV_TO_MP3, MP3_BITRATE, AUDIO_SAMPLE_RATE, AUDIO_BIT_DEPTH, AUDIO_CHANNELS, SKIP_EXISTING_AUDIO_FILES, LONG_AUDIO_TIMEOUT_SECONDS, USE_SSML, SSML_RULES_FILE, VALIDATE_SSML, FORCE_PLAIN_TEXT, MARKDOWN_RULES_FILE, MARKDOWN_ENGINE, FOLDER_WORKERS, LONG_AUDIO_MAX_JOBS, USE_TTS_CACHE, TTS_CACHE_MAX_MB
         
         # Override MOCK_MODE if specified on command line
         if args.mock:
@@ -1390,10 +2350,30 @@ def main():
             USE_SSML = False
         if args.ssml_rules_file:
             SSML_RULES_FILE = args.ssml_rules_file
+        if args.validate_ssml:
+            VALIDATE_SSML = True
             
         # Update MARKDOWN_RULES_FILE if specified on command line
         if args.markdown_rules_file:
             MARKDOWN_RULES_FILE = args.markdown_rules_file
+        
+        # Update MARKDOWN_ENGINE if specified on command line
+        if args.md_engine:
+            MARKDOWN_ENGINE = args.md_engine
+        
+        # Update FOLDER_WORKERS if specified on command line
+        if args.workers:
+            FOLDER_WORKERS = args.workers
+        
+        # Update LONG_AUDIO_MAX_JOBS if specified on command line
+        if args.long_audio_jobs:
+            LONG_AUDIO_MAX_JOBS = args.long_audio_jobs
+        
+        # Update the TTS cache settings if specified on command line
+        if args.no_tts_cache:
+            USE_TTS_CACHE = False
+        if args.tts_cache_max_mb:
+            TTS_CACHE_MAX_MB = args.tts_cache_max_mb
             
         # Update FORCE_PLAIN_TEXT if --use-ssml is specified
         if args.use_ssml: